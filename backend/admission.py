@@ -0,0 +1,116 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+
+# 0 turns rate limits, frame deadlines and connection admission off
+ADMISSION_CONTROL = os.environ.get("ADMISSION_CONTROL", "1").lower() in ("1", "true", "yes")
+# Frames per second a session may send, with short bursts up to SESSION_FRAME_BURST
+SESSION_FRAME_RATE = float(os.environ.get("SESSION_FRAME_RATE", "6"))
+SESSION_FRAME_BURST = float(os.environ.get("SESSION_FRAME_BURST", "2"))
+# A frame not in the models this long after it arrived is dropped instead of answered late
+FRAME_DEADLINE_MS = float(os.environ.get("FRAME_DEADLINE_MS", "800"))
+# Frames in the models at once across all sessions; 0 means two rounds of batches
+MAX_FRAMES_IN_FLIGHT = int(os.environ.get("MAX_FRAMES_IN_FLIGHT", "0"))
+# Hard cap on connected sessions; 0 leaves it to the load
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", "0"))
+# Scheduler pressure (frames in or waiting for the models / slots) at which new
+# sessions get a reduced frame rate, and at which they are turned away
+DEGRADE_PRESSURE = float(os.environ.get("ADMISSION_DEGRADE_PRESSURE", "1.0"))
+REJECT_PRESSURE = float(os.environ.get("ADMISSION_REJECT_PRESSURE", "2.0"))
+# Share of SESSION_FRAME_RATE a degraded session gets
+DEGRADED_RATE_SHARE = 0.5
+# Seconds a rejected client is told to wait before reconnecting
+RETRY_AFTER_SECONDS = 5
+
+class TokenBucket:
+    """`rate` frames per second on average, up to `burst` at once."""
+
+    def __init__(self, rate=SESSION_FRAME_RATE, burst=SESSION_FRAME_BURST):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+class FrameScheduler:
+    """Global gate in front of the models: a fixed number of slots, earliest deadline first.
+
+    A session has at most one frame waiting (its queue keeps only the
+    newest), so ordering by deadline serves sessions in turn, and a
+    session that sends faster doesn't get more turns. A frame whose
+    deadline passes while it waits is dropped instead of answered late.
+    """
+
+    def __init__(self, slots):
+        self.slots = max(1, slots)
+        self.running = 0
+        self.waiting = []
+        self._order = itertools.count()
+
+    @property
+    def pressure(self):
+        """Frames in or waiting for the models per slot; above 1.0 frames are queuing."""
+        return (self.running + len(self.waiting)) / self.slots
+
+    async def acquire(self, deadline):
+        """Wait for a slot; False if `deadline` (time.monotonic()) passed first."""
+        if deadline <= time.monotonic():
+            # Went stale behind the session's previous frame
+            return False
+        if self.running < self.slots and not self.waiting:
+            self.running += 1
+            return True
+        future = asyncio.get_running_loop().create_future()
+        entry = (deadline, next(self._order), future)
+        heapq.heappush(self.waiting, entry)
+        try:
+            # shield: a slot handed over by release() just as the deadline hits must not be lost
+            await asyncio.wait_for(asyncio.shield(future), max(0.0, deadline - time.monotonic()))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done():
+                granted = future.result()
+            else:
+                future.cancel()
+                granted = False
+                self.waiting.remove(entry)
+                heapq.heapify(self.waiting)
+            if isinstance(e, asyncio.CancelledError):
+                if granted:
+                    self.release()
+                raise
+            return granted
+        return future.result()
+
+    def release(self):
+        now = time.monotonic()
+        while self.waiting:
+            deadline, _, future = heapq.heappop(self.waiting)
+            if future.done():
+                continue
+            if deadline <= now:
+                future.set_result(False)
+                continue
+            # The slot passes straight to the waiter, so `running` stays the same
+            future.set_result(True)
+            return
+        self.running -= 1
+
+    def admit(self, session_count):
+        """Status for a new connection: "ok", "degraded" (reduced frame rate) or "rejected"."""
+        if MAX_SESSIONS and session_count >= MAX_SESSIONS:
+            return "rejected"
+        if self.pressure >= REJECT_PRESSURE:
+            return "rejected"
+        if self.pressure >= DEGRADE_PRESSURE:
+            return "degraded"
+        return "ok"
@@ -0,0 +1,268 @@
+import asyncio
+import os
+import random
+import sqlite3
+import time
+import uuid
+from xml.sax.saxutils import escape
+
+import httpx
+
+# Deliveries survive restarts here; pending ones are retried when the server comes back
+ALERT_QUEUE_PATH = os.environ.get("ALERT_QUEUE_PATH", "alert_queue.sqlite3")
+# "twilio" in production, "log" to run offline (deliveries are printed, not sent)
+ALERT_TRANSPORT = os.environ.get("ALERT_TRANSPORT", "twilio")
+# Point at a local fake server to exercise the real transport without Twilio
+TWILIO_API_URL = os.environ.get("TWILIO_API_URL", "https://api.twilio.com")
+TWILIO_WHATSAPP_NUMBER = os.environ.get("TWILIO_WHATSAPP_NUMBER", "+14155238886")
+# Requests in flight at once, also the size of the HTTP connection pool
+ALERT_CONCURRENCY = int(os.environ.get("ALERT_CONCURRENCY", "10"))
+ALERT_MAX_ATTEMPTS = int(os.environ.get("ALERT_MAX_ATTEMPTS", "5"))
+ALERT_RETRY_BASE_SECONDS = float(os.environ.get("ALERT_RETRY_BASE_SECONDS", "1.0"))
+ALERT_RETRY_MAX_SECONDS = float(os.environ.get("ALERT_RETRY_MAX_SECONDS", "30.0"))
+ALERT_TIMEOUT_SECONDS = float(os.environ.get("ALERT_TIMEOUT_SECONDS", "10.0"))
+
+class DeliveryError(Exception):
+    """A failed send; `retryable` is False when trying again can't help (bad number, bad credentials)."""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+class TwilioTransport:
+    """Twilio's REST API over one pooled async HTTP client.
+
+    `base_url` or `http_transport` swap Twilio for a fake server, such as
+    benchmarks/fake_twilio.py.
+    """
+
+    def __init__(self, account_sid, auth_token, from_number, base_url=TWILIO_API_URL,
+                 whatsapp_number=TWILIO_WHATSAPP_NUMBER, concurrency=ALERT_CONCURRENCY, http_transport=None):
+        self.account_sid = account_sid
+        self.from_number = from_number
+        self.whatsapp_number = whatsapp_number
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            auth=(account_sid or "", auth_token or ""),
+            timeout=ALERT_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            # e.g. httpx.ASGITransport around a fake server app
+            transport=http_transport
+        )
+
+    async def send(self, channel, to, body):
+        """Returns (sid, status) from Twilio, or raises DeliveryError."""
+        if channel == "call":
+            resource = "Calls"
+            data = {"To": to, "From": self.from_number, "Twiml": f"<Response><Say>{escape(body)}</Say></Response>"}
+        elif channel == "whatsapp":
+            resource = "Messages"
+            data = {"To": f"whatsapp:{to}", "From": f"whatsapp:{self.whatsapp_number}", "Body": body}
+        else:
+            resource = "Messages"
+            data = {"To": to, "From": self.from_number, "Body": body}
+
+        try:
+            response = await self.client.post(f"/2010-04-01/Accounts/{self.account_sid}/{resource}.json", data=data)
+        except httpx.HTTPError as e:
+            raise DeliveryError(f"{type(e).__name__}: {str(e)}")
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("message", response.text)
+            except ValueError:
+                detail = response.text
+            # Rate limits and server errors pass; other client errors won't
+            retryable = response.status_code == 429 or response.status_code >= 500
+            raise DeliveryError(f"HTTP {response.status_code}: {detail}", retryable=retryable)
+        result = response.json()
+        return result.get("sid"), result.get("status")
+
+    async def close(self):
+        await self.client.aclose()
+
+class LogTransport:
+    """Prints deliveries instead of sending them; for offline runs."""
+
+    async def send(self, channel, to, body):
+        print(f"📨 [{channel}] {to}: {body}")
+        return f"LOG{uuid.uuid4().hex[:16]}", "queued"
+
+    async def close(self):
+        pass
+
+def create_transport(name=ALERT_TRANSPORT):
+    if name == "log":
+        return LogTransport()
+    if name == "twilio":
+        return TwilioTransport(
+            os.getenv("TWILIO_ACCOUNT_SID"),
+            os.getenv("TWILIO_AUTH_TOKEN"),
+            os.getenv("TWILIO_NUMBER")
+        )
+    raise ValueError(f"Unknown ALERT_TRANSPORT '{name}', expected twilio or log")
+
+class AlertQueue:
+    """One row per (alert, recipient, channel) with its delivery state, in SQLite."""
+
+    def __init__(self, path=ALERT_QUEUE_PATH):
+        # Only the event loop thread touches the connection
+        self.conn = sqlite3.connect(path or ":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS deliveries ("
+                "id INTEGER PRIMARY KEY, alert_id TEXT NOT NULL, recipient TEXT NOT NULL, "
+                "channel TEXT NOT NULL, body TEXT NOT NULL, status TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, "
+                "sid TEXT, twilio_status TEXT, error TEXT, updated_at REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS deliveries_alert ON deliveries (alert_id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS deliveries_due ON deliveries (status, next_attempt_at)")
+            # Sends cut short by a restart go out again
+            self.conn.execute("UPDATE deliveries SET status = 'pending' WHERE status = 'sending'")
+
+    def add(self, alert_id, message, contacts, channels):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO deliveries (alert_id, recipient, channel, body, status, next_attempt_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'sending', ?, ?)",
+                [(alert_id, to, channel, message, now, now) for to in contacts for channel in channels]
+            )
+        return self.conn.execute("SELECT * FROM deliveries WHERE alert_id = ? ORDER BY id", (alert_id,)).fetchall()
+
+    def claim_due(self, limit):
+        """Pending deliveries whose retry time has come, marked as sending."""
+        with self.conn:
+            rows = self.conn.execute(
+                "SELECT * FROM deliveries WHERE status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT ?",
+                (time.time(), limit)
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE deliveries SET status = 'sending' WHERE id = ?",
+                [(row["id"],) for row in rows]
+            )
+        return rows
+
+    def next_due(self):
+        row = self.conn.execute("SELECT MIN(next_attempt_at) FROM deliveries WHERE status = 'pending'").fetchone()
+        return row[0]
+
+    def sent(self, delivery_id, sid, twilio_status):
+        """Accepted by Twilio; `twilio_status` is its own view, e.g. queued."""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE deliveries SET status = 'sent', attempts = attempts + 1, sid = ?, "
+                "twilio_status = ?, error = NULL, updated_at = ? WHERE id = ?",
+                (sid, twilio_status, time.time(), delivery_id)
+            )
+
+    def failed(self, delivery_id, error, retry_at=None):
+        """Back to pending until `retry_at`, or failed for good without one."""
+        status = "pending" if retry_at is not None else "failed"
+        with self.conn:
+            self.conn.execute(
+                "UPDATE deliveries SET status = ?, attempts = attempts + 1, next_attempt_at = ?, "
+                "error = ?, updated_at = ? WHERE id = ?",
+                (status, retry_at or time.time(), error, time.time(), delivery_id)
+            )
+
+    def status(self, alert_id):
+        rows = self.conn.execute(
+            "SELECT recipient, channel, status, attempts, sid, twilio_status, error FROM deliveries "
+            "WHERE alert_id = ? ORDER BY id",
+            (alert_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+class AlertDispatcher:
+    """Fans one alert out to every contact and channel at once.
+
+    The first attempt for each delivery starts as soon as the alert is
+    submitted. Failures that may pass (timeouts, rate limits, server errors)
+    go back into the queue with exponential backoff, and a background loop
+    retries them until ALERT_MAX_ATTEMPTS; the queue is on disk, so retries
+    outlive a restart.
+    """
+
+    def __init__(self, transport, queue, concurrency=ALERT_CONCURRENCY, max_attempts=ALERT_MAX_ATTEMPTS,
+                 retry_base=ALERT_RETRY_BASE_SECONDS, retry_max=ALERT_RETRY_MAX_SECONDS):
+        self.transport = transport
+        self.queue = queue
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._retry_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.transport.close()
+        self.queue.close()
+
+    async def submit(self, message, contacts, channels):
+        """Queue the alert, make the first attempt for every delivery, return (alert_id, statuses)."""
+        alert_id = uuid.uuid4().hex
+        rows = self.queue.add(alert_id, message, contacts, channels)
+        start = time.perf_counter()
+        await asyncio.gather(*(self._deliver(row) for row in rows))
+        print(f"🚨 Alert {alert_id}: {len(rows)} deliveries attempted in {time.perf_counter() - start:.2f}s")
+        return alert_id, self.queue.status(alert_id)
+
+    def _backoff(self, attempts):
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        # Jitter, so retries from one outage don't arrive together
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _deliver(self, row):
+        attempts = row["attempts"] + 1
+        async with self.semaphore:
+            try:
+                sid, twilio_status = await self.transport.send(row["channel"], row["recipient"], row["body"])
+            except Exception as e:
+                retryable = getattr(e, "retryable", True) and attempts < self.max_attempts
+                retry_at = time.time() + self._backoff(attempts) if retryable else None
+                self.queue.failed(row["id"], str(e), retry_at)
+                print(
+                    f"⚠️ Alert {row['channel']} to {row['recipient']} failed (attempt {attempts}): {str(e)}"
+                    f"{'' if retryable else ', giving up'}"
+                )
+                if retryable:
+                    self._wake.set()
+                return
+        self.queue.sent(row["id"], sid, twilio_status)
+
+    async def _retry_loop(self):
+        while True:
+            try:
+                rows = self.queue.claim_due(self.concurrency)
+                if rows:
+                    await asyncio.gather(*(self._deliver(row) for row in rows))
+                    continue
+                due = self.queue.next_due()
+                timeout = None if due is None else max(0.0, due - time.time())
+            except sqlite3.Error as e:
+                print(f"❌ Alert queue error: {str(e)}")
+                timeout = self.retry_max
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
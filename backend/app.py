@@ -1,39 +1,142 @@
-import cv2
 import numpy as np
 import asyncio
-import base64
+import math
 import os
-from concurrent.futures import ThreadPoolExecutor
-from queue import Queue
+import time
+from collections import deque
 from threading import Lock
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from ultralytics import YOLO
-from translation import translate_text
-from depth import get_depth
+from fastapi.responses import JSONResponse, Response
+from backends import YOLO_MODEL_PATH
+from translation import translation_service, PhraseEngine
+from depth import get_depth, depth_from_map, detected_objects_from_results, DEPTH_INPUT_SIZE, ObstacleGrid
+from batching import MicroBatcher
+from frames import FrameDecoder
+from scene import scene_thumbnail, scene_changed
+from workers import INFERENCE_WORKERS, WORKER_BATCH_SIZE, WorkerPool
+from cluster import INFERENCE_NODES, NodePool
+from control import ADAPTIVE_CONTROL, InferenceLoad, SessionControl
+from tracking import TRACKING, SessionTracker
+from facemesh import FaceMeshStage, create_stage
+from streaming import ResultEncoder
+from compute import THREAD_BUDGET, ComputeBudget
+from admission import (
+    ADMISSION_CONTROL, DEGRADE_PRESSURE, DEGRADED_RATE_SHARE, FRAME_DEADLINE_MS, MAX_FRAMES_IN_FLIGHT,
+    RETRY_AFTER_SECONDS, SESSION_FRAME_RATE, FrameScheduler, TokenBucket
+)
+from sessions import (
+    SESSION_IDLE_SECONDS, SESSION_PAUSED_IDLE_SECONDS, SESSION_RESUME_SECONDS, IdleEvictor, new_session_token
+)
+from models import PRELOAD_MODELS, registry
+import metrics
+import orjson
+from metrics import InstrumentedExecutor, timed
 from pydantic import BaseModel
-from typing import Dict, List
-from dataclasses import dataclass
-from datetime import datetime, timedelta
-from twilio_calls import router as twilio_router
+from typing import Dict, List, Optional
+from dataclasses import dataclass, field
+from twilio_calls import router as twilio_router, start_dispatcher, stop_dispatcher
+
+# In-process models share the cores by budget; worker processes and nodes handle their own
+compute_budget = (
+    ComputeBudget({"detection": 2, "depth": 2})
+    if THREAD_BUDGET and INFERENCE_WORKERS == 0 and not INFERENCE_NODES else None
+)
+
+def stage_initializer(stage):
+    return compute_budget.initializer(stage) if compute_budget is not None else None
 
 # Initialize thread pools and queues
-detection_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="detection")
-depth_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="depth")
-translation_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="translation")
+detection_executor = InstrumentedExecutor(max_workers=2, thread_name_prefix="detection", initializer=stage_initializer("detection"))
+depth_executor = InstrumentedExecutor(max_workers=2, thread_name_prefix="depth", initializer=stage_initializer("depth"))
+translation_executor = InstrumentedExecutor(max_workers=2, thread_name_prefix="translation")
+facemesh_executor = InstrumentedExecutor(max_workers=2, thread_name_prefix="facemesh", initializer=stage_initializer("other"))
+
+if compute_budget is not None:
+    compute_budget.apply()
+    metrics.register_compute_budget(compute_budget)
 
 # Create result caches with locks
 result_cache = {}
 cache_lock = Lock()
-CACHE_TIMEOUT = 0.5  # 500ms cache timeout
+# Max age of a cached result while the scene looks unchanged
+CACHE_TIMEOUT = float(os.environ.get("SCENE_CACHE_MAX_AGE", "1.0"))
+
+@dataclass
+class CachedResult:
+    """Model outputs for the last frame that actually went through inference."""
+    timestamp: float
+    thumbnail: np.ndarray
+    detected_objects: list
+    depth_map: np.ndarray
+    # (width, height) of that frame: the boxes are in its pixels, not a later frame's
+    frame_size: tuple
+    # Track events from this inference; cached replays don't repeat them
+    events: list = field(default_factory=list)
+
+def get_cached_result(session_id: str, thumbnail) -> Optional[CachedResult]:
+    with cache_lock:
+        cached = result_cache.get(session_id)
+    if cached is None or time.monotonic() - cached.timestamp > CACHE_TIMEOUT:
+        return None
+    if scene_changed(thumbnail, cached.thumbnail):
+        return None
+    return cached
 
 class ProcessingQueue:
+    """Per-session latest-frame-wins hand-off between receive, inference and send.
+
+    Each slot holds at most one item. Putting a new frame over one that
+    inference hasn't picked up yet drops the stale frame, so inference
+    always works on the freshest picture of the scene.
+    """
+
     def __init__(self):
-        self.detection_queue = Queue(maxsize=3)
-        self.depth_queue = Queue(maxsize=3)
-        self.translation_queue = Queue(maxsize=3)
+        self.decoder = FrameDecoder()
+        self.frame = None
+        # time.monotonic() when the waiting frame arrived; its deadline counts from here
+        self.frame_received_at = None
+        self.frame_ready = asyncio.Event()
+        self.result = None
+        self.result_ready = asyncio.Event()
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.results_dropped = 0
+
+    def put_frame(self, frame, received_at):
+        if self.frame is not None:
+            self.frames_dropped += 1
+            metrics.frames_dropped.inc()
+            self.decoder.recycle(self.frame)
+        self.frame = frame
+        self.frame_received_at = received_at
+        self.frames_received += 1
+        metrics.frames_received.inc()
+        self.frame_ready.set()
+
+    async def get_frame(self):
+        """The newest frame and when it arrived."""
+        await self.frame_ready.wait()
+        self.frame_ready.clear()
+        frame, self.frame = self.frame, None
+        return frame, self.frame_received_at
+
+    def put_result(self, result):
+        if self.result is not None:
+            self.results_dropped += 1
+            metrics.results_dropped.inc()
+        self.result = result
+        self.result_ready.set()
+
+    async def get_result(self):
+        await self.result_ready.wait()
+        self.result_ready.clear()
+        result, self.result = self.result, None
+        return result
 
 processing_queues = {}
+metrics.active_sessions.set_function(lambda: len(processing_queues))
+metrics.register_translation_service(translation_service)
 
 app = FastAPI()
 
@@ -53,36 +156,172 @@ class TranslationRequest(BaseModel):
     text: str
     target_lang: str
 
+class BatchTranslationRequest(BaseModel):
+    texts: List[str]
+    target_lang: str
+
 @app.post("/translate")
 async def translate_text_endpoint(request: TranslationRequest):
-    translated = translate_text(request.text, target_lang=request.target_lang)
+    translated = await asyncio.get_event_loop().run_in_executor(
+        translation_executor,
+        translation_service.translate,
+        request.text,
+        request.target_lang
+    )
     return {"translated_text": translated}
 
-# Track active connections
+@app.post("/translate/batch")
+async def translate_batch_endpoint(request: BatchTranslationRequest):
+    """Translate a whole screen of strings in one round trip."""
+    translated = await asyncio.get_event_loop().run_in_executor(
+        translation_executor,
+        translation_service.translate_many,
+        request.texts,
+        request.target_lang
+    )
+    return {"translated_texts": translated}
+
 @dataclass
 class ClientState:
-    websocket: WebSocket
+    """One session, keyed by its token; outlives its socket for SESSION_RESUME_SECONDS."""
+    websocket: Optional[WebSocket]
     is_active: bool
-    last_active: datetime
     target_lang: str
+    encoder: Optional[ResultEncoder] = None
+    distance_buffer: deque = field(default_factory=lambda: deque(maxlen=8))
+    control: SessionControl = field(default_factory=SessionControl)
+    tracker: Optional[SessionTracker] = field(default_factory=lambda: SessionTracker() if TRACKING else None)
+    facemesh: Optional[FaceMeshStage] = None
+    grid: Optional[ObstacleGrid] = None
+    # Frames beyond the session's rate are dropped unread; degraded sessions get a lower rate
+    bucket: TokenBucket = field(default_factory=TokenBucket)
+    degraded: bool = False
+
+    def __post_init__(self):
+        if ADMISSION_CONTROL:
+            self.set_frame_rate(self.bucket.rate)
+
+    def set_frame_rate(self, rate):
+        """Frames per second the session may send; the capture interval it is told follows."""
+        self.bucket.rate = rate
+        self.control.min_interval_ms = math.ceil(1000 / rate)
+
+    def idle_timeout(self):
+        if self.websocket is None:
+            return SESSION_RESUME_SECONDS
+        return SESSION_IDLE_SECONDS if self.is_active else SESSION_PAUSED_IDLE_SECONDS
+
+active_clients: Dict[str, ClientState] = {}
+
+async def expire_session(session_id: str):
+    """Idle too long: close the socket if there still is one and drop the session's state."""
+    client = active_clients.pop(session_id, None)
+    if client is None:
+        return
+    metrics.sessions_evicted.inc()
+    print(f"🧹 Evicting idle session: {session_id}")
+    if client.websocket is not None:
+        try:
+            await client.websocket.close(code=1001, reason="idle")
+        except Exception:
+            pass
+    with cache_lock:
+        result_cache.pop(session_id, None)
+    if client.facemesh is not None:
+        # Waits for a mesh inference still running on the stage, so not on the event loop
+        await asyncio.get_event_loop().run_in_executor(facemesh_executor, client.facemesh.close)
+
+session_evictor = IdleEvictor(expire_session)
+metrics.sessions.set_function(lambda: len(active_clients))
+metrics.paused_sessions.set_function(lambda: sum(not client.is_active for client in active_clients.values()))
+
+def touch_session(session_id: str):
+    client = active_clients.get(session_id)
+    if client is not None:
+        session_evictor.touch(session_id, client.idle_timeout())
+
+# Labels and sentence words are translated once per language, not once per frame
+phrase_engine: Optional[PhraseEngine] = None
+# Comma-separated languages whose phrase tables are built at startup, e.g. "hi"
+WARM_LANGUAGES = [lang for lang in os.environ.get("WARM_LANGUAGES", "").split(",") if lang]
+
+phrase_engine_lock = Lock()
+
+def build_phrase_engine() -> PhraseEngine:
+    """Phrase engine over the detector's labels; blocks until YOLO is loaded."""
+    global phrase_engine
+    with phrase_engine_lock:
+        if phrase_engine is None:
+            if worker_pool is not None:
+                names = worker_pool.names
+            else:
+                names = registry.get("yolo").names
+            phrase_engine = PhraseEngine(names.values())
+    return phrase_engine
+
+async def get_phrase_engine() -> PhraseEngine:
+    """The phrase engine, built off the event loop: the labels may need a model load."""
+    if phrase_engine is not None:
+        return phrase_engine
+    return await asyncio.get_event_loop().run_in_executor(detection_executor, build_phrase_engine)
+
+# Frames from all connected sockets are grouped into one ultralytics call
+DETECTION_BATCH_SIZE = int(os.environ.get("DETECTION_BATCH_SIZE", "8"))
+DETECTION_BATCH_WINDOW_MS = float(os.environ.get("DETECTION_BATCH_WINDOW_MS", "15"))
+
+def detect_batch(frames):
+    level = inference_load.model_level
+    return registry.get("yolo")(frames, imgsz=level.yolo_imgsz, verbose=False)
+
+def estimate_depth_batch(frames):
+    return registry.get("depth").infer(frames, inference_load.model_level.depth_input_size)
+
+detection_batcher = MicroBatcher(
+    "Detection",
+    detect_batch,
+    detection_executor,
+    max_batch=DETECTION_BATCH_SIZE,
+    window_ms=DETECTION_BATCH_WINDOW_MS
+)
 
-# Replace the active_connections dict with a more detailed tracking
-active_clients: Dict[int, ClientState] = {}
+# Depth is the most expensive stage, so it is batched across sockets the same way
+DEPTH_BATCH_SIZE = int(os.environ.get("DEPTH_BATCH_SIZE", "4"))
+DEPTH_BATCH_WINDOW_MS = float(os.environ.get("DEPTH_BATCH_WINDOW_MS", "15"))
 
-# Determine model path - default to YOLOv8n if custom model not found
-MODEL_PATH = os.environ.get("YOLO_MODEL_PATH", "yolov8n.pt")
-print(f"🔄 Loading YOLO model from {MODEL_PATH}")
+depth_batcher = MicroBatcher(
+    "Depth",
+    estimate_depth_batch,
+    depth_executor,
+    max_batch=DEPTH_BATCH_SIZE,
+    window_ms=DEPTH_BATCH_WINDOW_MS
+)
 
-# Load YOLO model
-model = YOLO(MODEL_PATH)
-print("✅ Model loaded successfully")
+# With INFERENCE_NODES set the models run on inference nodes over TCP (see cluster.py);
+# with INFERENCE_WORKERS > 0 in separate processes fed through shared memory
+if INFERENCE_NODES:
+    worker_pool = NodePool(INFERENCE_NODES)
+elif INFERENCE_WORKERS > 0:
+    worker_pool = WorkerPool(INFERENCE_WORKERS, YOLO_MODEL_PATH, DEPTH_INPUT_SIZE)
+else:
+    worker_pool = None
+
+# Frames one round of batches holds; beyond that they queue and the model resolution drops
+inference_load = InferenceLoad(
+    (len(INFERENCE_NODES) or INFERENCE_WORKERS) * WORKER_BATCH_SIZE if worker_pool is not None else DEPTH_BATCH_SIZE
+)
+# All sessions' frames take turns for the models, earliest deadline first; two rounds keep batches full
+frame_scheduler = FrameScheduler(MAX_FRAMES_IN_FLIGHT or 2 * inference_load.capacity)
+metrics.scheduler_pressure.set_function(lambda: frame_scheduler.pressure)
+metrics.inference_load.set_function(lambda: inference_load.load)
+metrics.model_level.set_function(lambda: inference_load.stepper.level)
 
 async def process_frame_detection(frame):
     if frame is None:
         return None, "Invalid frame"
     try:
-        results = model(frame)[0]
-        detected_objects = [model.names[int(box.cls)] for box in results.boxes]
+        with timed("detection"):
+            results = await detection_batcher.submit(frame)
+        detected_objects = [results.names[int(box.cls)] for box in results.boxes]
         detection_text = ", ".join(set(detected_objects)) if detected_objects else "No objects detected"
         return results, detection_text
     except Exception as e:
@@ -90,14 +329,32 @@ async def process_frame_detection(frame):
         return None, "Detection error"
 
 async def process_frame_depth(frame):
+    """Depth map for one frame, batched with frames from other sockets."""
     if frame is None:
         return None
     try:
-        depth_result = await asyncio.get_event_loop().run_in_executor(
-            depth_executor,
-            get_depth,
-            frame
-        )
+        with timed("depth"):
+            return await depth_batcher.submit(frame)
+    except Exception as e:
+        print(f"❌ Depth error: {str(e)}")
+        return None
+
+async def process_fused_depth(depth_map, detected_objects, frame_size, buffer, grid=None):
+    """Scene distance plus per-object distances from one depth map and the YOLO boxes."""
+    if depth_map is None:
+        return None
+    try:
+        # The second depth thread post-processes while the next batch runs
+        with timed("depth_postprocess"):
+            depth_result = await asyncio.get_event_loop().run_in_executor(
+                depth_executor,
+                depth_from_map,
+                depth_map,
+                detected_objects,
+                frame_size,
+                buffer,
+                grid
+            )
         if isinstance(depth_result, dict):
             return depth_result
         return {"depth": depth_result, "confidence": 1.0, "method": "default"}
@@ -105,150 +362,443 @@ async def process_frame_depth(frame):
         print(f"❌ Depth error: {str(e)}")
         return None
 
-async def process_translation(text, target_lang):
-    if not text or not target_lang:
-        return text
+async def process_facemesh(stage: FaceMeshStage, frame):
+    """Face landmark features from the already decoded frame, in the session's own tracking graph."""
     try:
-        if target_lang == "en":
-            return text
-        return await asyncio.get_event_loop().run_in_executor(
-            translation_executor,
-            translate_text,
-            text,
-            target_lang
-        )
+        with timed("facemesh"):
+            return await asyncio.get_event_loop().run_in_executor(facemesh_executor, stage.process, frame)
+    except Exception as e:
+        print(f"❌ Face mesh error: {str(e)}")
+        return []
+
+async def process_translation(labels, distance, target_lang):
+    """Localized detection sentence; only a language's first use goes to the network."""
+    target_lang = target_lang or "en"
+    engine = await get_phrase_engine()
+    try:
+        with timed("translation"):
+            if not engine.is_ready(target_lang):
+                await asyncio.get_event_loop().run_in_executor(
+                    translation_executor,
+                    engine.phrases,
+                    target_lang
+                )
+            return engine.sentence(labels, distance, target_lang)
     except Exception as e:
         print(f"❌ Translation error: {str(e)}")
-        return text
+        return engine.sentence(labels, distance, "en")
+
+async def apply_control(session_id: str, message: dict) -> bool:
+    """Pause, resume or change language for a session; False if the session or message is unknown."""
+    client = active_clients.get(session_id)
+    if client is None:
+        return False
+    kind = message.get("type")
+    if kind is None and "isActive" in message:
+        # The original /ws/state message
+        kind = "resume" if message["isActive"] else "pause"
+    if kind == "pause":
+        client.is_active = False
+    elif kind == "resume":
+        client.is_active = True
+    elif kind == "language" and message.get("target"):
+        client.target_lang = message["target"]
+        if client.encoder is not None:
+            # The last sentence sent is in the old language
+            client.encoder.reset()
+    else:
+        return False
+    touch_session(session_id)
+    print(f"📱 Session {session_id}: {kind}{' ' + client.target_lang if kind == 'language' else ''}")
+    return True
+
+async def send_session(session_id: str, resumed: bool = False):
+    """The session's token and settings, sent on connect and after each control message."""
+    client = active_clients.get(session_id)
+    if client is None or client.websocket is None or client.encoder is None:
+        return
+    message = client.encoder.serialize({
+        "type": "session",
+        "session": session_id,
+        "resumed": resumed,
+        "paused": not client.is_active,
+        "target": client.target_lang,
+        # "degraded": admitted under load with a lower frame rate until the load drops
+        "status": "degraded" if client.degraded else "ok",
+        "max_fps": client.bucket.rate if ADMISSION_CONTROL else None
+    })
+    if client.encoder.binary:
+        await client.websocket.send_bytes(message)
+    else:
+        await client.websocket.send_text(message)
 
 @app.websocket("/ws/state")
 async def app_state(websocket: WebSocket):
-    client_id = id(websocket)
-    
+    """One control message for ?session=<token>; the /ws/video socket itself takes the same messages."""
+    session_id = websocket.query_params.get("session")
+
     try:
         await websocket.accept()
         data = await websocket.receive_json()
-        is_active = data.get('isActive', False)
-        
-        if client_id in active_clients:
-            active_clients[client_id].is_active = is_active
-            active_clients[client_id].last_active = datetime.now()
-            print(f"📱 Client {client_id} state changed: {'active' if is_active else 'inactive'}")
+        if session_id and await apply_control(session_id, data):
+            await send_session(session_id)
+        else:
+            print(f"⚠️ State update for unknown session: {session_id}")
     except Exception as e:
         print(f"❌ State update error: {str(e)}")
     finally:
         await websocket.close()
 
+def dropped_response(client: ClientState, reason: str):
+    """Reply for a frame that won't get a result, so a client waiting on it can send the next."""
+    response = {"status": "dropped", "reason": reason}
+    if ADAPTIVE_CONTROL:
+        # Carries the interval that keeps the client under its rate limit
+        response["control"] = client.control.message()
+    return response
+
+async def receive_frames(websocket: WebSocket, session_id: str, queue: ProcessingQueue):
+    """Frames and control messages from one socket; waits without polling, so paused sessions cost nothing."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        text = message.get("text")
+
+        # Control messages are JSON text; base64 frames never start with "{"
+        if text is not None and text.startswith("{"):
+            try:
+                control = orjson.loads(text)
+            except orjson.JSONDecodeError:
+                print(f"⚠️ Invalid control message: {session_id}")
+                continue
+            if await apply_control(session_id, control):
+                await send_session(session_id)
+            else:
+                print(f"⚠️ Unknown control message: {session_id} - {text[:100]}")
+            continue
+
+        client = active_clients.get(session_id)
+        if client is None:
+            return
+        touch_session(session_id)
+        if not client.is_active:
+            # Sent before the client saw its own pause; not worth decoding
+            continue
+        if ADMISSION_CONTROL and not client.bucket.take():
+            metrics.frames_rate_limited.inc()
+            # A result already waiting to be sent answers the client anyway
+            if queue.result is None:
+                queue.put_result(dropped_response(client, "rate_limited"))
+            continue
+        received_at = time.monotonic()
+
+        # Validate and decode frame
+        try:
+            with timed("decode"):
+                if text is None:
+                    frame = queue.decoder.decode(message.get("bytes"))
+                else:
+                    frame = queue.decoder.decode_base64(text)
+            if frame is None:
+                metrics.stage_errors.labels("decode").inc()
+                print(f"⚠️ Invalid frame received: {session_id}")
+                continue
+        except Exception as e:
+            print(f"❌ Frame decode error: {str(e)}")
+            continue
+
+        queue.put_frame(frame, received_at)
+
+async def process_frame_workers(frame, detect=True):
+    """Detection and depth in an inference worker process or on an inference node."""
+    try:
+        with timed("inference"):
+            return await worker_pool.submit(frame, inference_load.stepper.level, detect)
+    except Exception as e:
+        print(f"❌ Inference worker error: {str(e)}")
+        return None, None
+
+async def run_models(session_id: str, frame, thumbnail) -> Optional[CachedResult]:
+    """Run detection and depth for one frame and cache the outputs for the session."""
+    tracker = active_clients[session_id].tracker
+    # With tracking, YOLO runs only every few frames and the tracker fills the gaps
+    detect = tracker is None or tracker.needs_detection()
+    with inference_load.track():
+        if worker_pool is not None:
+            detected_objects, depth_map = await process_frame_workers(frame, detect)
+            failed = detected_objects is None if detect else depth_map is None
+            if failed:
+                return None
+        else:
+            detection_task = asyncio.create_task(process_frame_detection(frame)) if detect else None
+            depth_task = asyncio.create_task(process_frame_depth(frame))
+
+            results = None
+            if detection_task is not None:
+                results, _ = await detection_task
+            depth_map = await depth_task
+            if detect and results is None:
+                return None
+            # Keep plain data only: Results holds the frame, whose buffer gets recycled
+            detected_objects = detected_objects_from_results(results) if detect else None
+
+    events = []
+    if tracker is not None:
+        if detect:
+            detected_objects, events = tracker.update(detected_objects)
+        else:
+            detected_objects, events = tracker.predict()
+            metrics.detections_skipped.inc()
+
+    outputs = CachedResult(
+        timestamp=time.monotonic(),
+        thumbnail=thumbnail,
+        detected_objects=detected_objects,
+        depth_map=depth_map,
+        frame_size=(frame.shape[1], frame.shape[0]),
+        events=events
+    )
+    with cache_lock:
+        result_cache[session_id] = outputs
+    return outputs
+
+async def process_frame(session_id: str, frame, target_lang: str, deadline: Optional[float] = None):
+    """Run detection, depth and translation for one frame and build the response.
+
+    Without a free model slot before `deadline` (time.monotonic()) the frame is dropped: None.
+    """
+    start = time.perf_counter()
+    if session_id not in active_clients:
+        return None
+    # Skip inference while the scene hasn't visibly changed since the cached result
+    thumbnail = scene_thumbnail(frame)
+    outputs = get_cached_result(session_id, thumbnail)
+    cached = outputs is not None
+    if cached:
+        metrics.frames_cached.inc()
+    else:
+        scheduled = ADMISSION_CONTROL and deadline is not None
+        if scheduled and not await frame_scheduler.acquire(deadline):
+            # An answer this late would describe a scene the user has moved on from
+            metrics.frames_expired.inc()
+            client = active_clients.get(session_id)
+            return dropped_response(client, "deadline") if client is not None else None
+        try:
+            outputs = await run_models(session_id, frame, thumbnail)
+        finally:
+            if scheduled:
+                frame_scheduler.release()
+
+    client = active_clients.get(session_id)
+    if outputs is None or client is None or not client.is_active:
+        return None
+
+    # Only fresh frames with a person in them, and no more often than the stage's interval
+    facemesh_task = None
+    if client.facemesh is not None and not cached and client.facemesh.due(outputs.detected_objects):
+        facemesh_task = asyncio.create_task(process_facemesh(client.facemesh, frame))
+
+    # Fused stage: per-box distances from the same depth map, no extra inference
+    depth_result = await process_fused_depth(
+        outputs.depth_map,
+        outputs.detected_objects,
+        outputs.frame_size,
+        client.distance_buffer,
+        client.grid
+    )
+
+    # Labels are announced nearest first when per-object distances are available
+    if isinstance(depth_result, dict) and depth_result.get("objects"):
+        labels = [obj["class"] for obj in depth_result["objects"]]
+    else:
+        labels = [obj["class"] for obj in outputs.detected_objects]
+    distance = depth_result.get("depth") if isinstance(depth_result, dict) else None
+    translated_text = await process_translation(labels, distance, target_lang)
+
+    response = {
+        "depth": depth_result.get("depth") if isinstance(depth_result, dict) else None,
+        "confidence": depth_result.get("confidence", 0) if isinstance(depth_result, dict) else 0,
+        "method": depth_result.get("method", "none") if isinstance(depth_result, dict) else "none",
+        "objects": depth_result.get("objects", []) if isinstance(depth_result, dict) else [],
+        "translated_text": translated_text,
+        "cached": cached,
+        "status": "success"
+    }
+    if client.grid is not None:
+        # Nearest distance per cell, rows top to bottom, for steering around obstacles
+        response["grid"] = depth_result.get("grid") if isinstance(depth_result, dict) else None
+    if client.facemesh is not None:
+        # Between face mesh runs the last faces stand
+        response["faces"] = await facemesh_task if facemesh_task is not None else client.facemesh.faces
+    if client.tracker is not None:
+        # Track ids that appeared or were lost for good since the last inference
+        response["events"] = [] if cached else outputs.events
+    if ADAPTIVE_CONTROL:
+        # Recommended capture interval, JPEG quality and width for this client
+        response["control"] = client.control.update(time.perf_counter() - start, inference_load.load)
+    return response
+
+async def infer_frames(session_id: str, queue: ProcessingQueue):
+    while True:
+        frame, received_at = await queue.get_frame()
+        start = time.perf_counter()
+        try:
+            # Read per frame: a language change applies from the next frame on
+            client = active_clients.get(session_id)
+            target_lang = client.target_lang if client is not None else "en"
+            response = await process_frame(session_id, frame, target_lang, received_at + FRAME_DEADLINE_MS / 1000.0)
+        except Exception as e:
+            print(f"❌ Processing error: {str(e)}")
+            response = {
+                "error": str(e),
+                "status": "error"
+            }
+        finally:
+            queue.decoder.recycle(frame)
+            metrics.frame_seconds.observe(time.perf_counter() - start)
+        # Hand off to the sender and move straight on to the newest frame
+        if response is not None:
+            queue.put_result(response)
+        if client is not None and client.degraded and frame_scheduler.pressure < DEGRADE_PRESSURE / 2:
+            # The load that got the session degraded has passed
+            client.degraded = False
+            client.set_frame_rate(SESSION_FRAME_RATE)
+            await send_session(session_id)
+
+async def send_results(websocket: WebSocket, queue: ProcessingQueue, encoder: ResultEncoder):
+    while True:
+        response = await queue.get_result()
+        if not websocket.client_state.CONNECTED:
+            continue
+        with timed("send"):
+            message = encoder.encode(response)
+            if message is None:
+                metrics.results_suppressed.inc()
+                continue
+            if encoder.binary:
+                await websocket.send_bytes(message)
+            else:
+                await websocket.send_text(message)
+        metrics.bytes_sent.labels(encoder.encoding).inc(len(message))
+
 @app.websocket("/ws/video")
 async def video_stream(websocket: WebSocket):
-    client_id = id(websocket)
-    target_lang = websocket.query_params.get("target", "en")
-    processing_queues[client_id] = ProcessingQueue()
-    
+    # ?session=<token> resumes a session (tracks, smoothing, language) after a reconnect
+    session_id = websocket.query_params.get("session") or new_session_token()
+    target_lang = websocket.query_params.get("target")
+    # Frames may be raw JPEG bytes or base64 text; the format is detected per message
+    # ?delta=1 sends only changes plus periodic keyframes; ?encoding=msgpack sends binary results
+    delta = websocket.query_params.get("delta", "0").lower() in ("1", "true", "yes")
+    encoding = websocket.query_params.get("encoding", "json")
+    # ?facemesh=1 adds face landmark features on frames with a person
+    facemesh = websocket.query_params.get("facemesh", "0").lower() in ("1", "true", "yes")
+    # ?grid=1 adds a coarse obstacle grid computed from the same depth map
+    grid = websocket.query_params.get("grid", "0").lower() in ("1", "true", "yes")
+    queue = ProcessingQueue()
+    tasks = []
+
     try:
+        encoder = ResultEncoder(delta=delta, encoding=encoding)
         await websocket.accept()
-        active_clients[client_id] = ClientState(
-            websocket=websocket,
-            is_active=True,
-            last_active=datetime.now(),
-            target_lang=target_lang
-        )
-        print(f"✅ WebSocket connected: {client_id} (target: {target_lang})")
-        
-        while True:
+        client = active_clients.get(session_id)
+        resumed = client is not None
+        if client is None:
+            # Resumed sessions are always let back in; new ones only while there is room
+            admission = frame_scheduler.admit(len(processing_queues)) if ADMISSION_CONTROL else "ok"
+            metrics.sessions_admitted.labels(admission).inc()
+            if admission == "rejected":
+                print(f"⚠️ Session rejected, server at capacity: {session_id}")
+                message = encoder.serialize({
+                    "type": "session",
+                    "status": "rejected",
+                    "reason": "server at capacity",
+                    "retry_after": RETRY_AFTER_SECONDS
+                })
+                if encoder.binary:
+                    await websocket.send_bytes(message)
+                else:
+                    await websocket.send_text(message)
+                # 1013: try again later
+                await websocket.close(code=1013, reason="server at capacity")
+                return
+            client = ClientState(websocket=None, is_active=True, target_lang=target_lang or "en")
+            if admission == "degraded":
+                client.degraded = True
+                client.set_frame_rate(SESSION_FRAME_RATE * DEGRADED_RATE_SHARE)
+            active_clients[session_id] = client
+        elif client.websocket is not None:
+            # The same token on a new socket: the old one is dead or stale
+            stale, client.websocket = client.websocket, None
             try:
-                # Check connection state
-                if not websocket.client_state.CONNECTED:
-                    print(f"🔌 Client disconnected: {client_id}")
-                    break
-
-                # Check if client is active
-                if not active_clients[client_id].is_active:
-                    await asyncio.sleep(0.5)
-                    continue
-
-                # Receive frame with timeout
-                try:
-                    data = await asyncio.wait_for(
-                        websocket.receive_text(),
-                        timeout=5.0
-                    )
-                except asyncio.TimeoutError:
-                    continue
-
-                # Update activity timestamp
-                active_clients[client_id].last_active = datetime.now()
-
-                # Validate and decode frame
-                try:
-                    frame_data = base64.b64decode(data)
-                    np_frame = np.frombuffer(frame_data, np.uint8)
-                    frame = cv2.imdecode(np_frame, cv2.IMREAD_COLOR)
-                    if frame is None:
-                        print(f"⚠️ Invalid frame received: {client_id}")
-                        continue
-                except Exception as e:
-                    print(f"❌ Frame decode error: {str(e)}")
-                    continue
-
-                # Process frame
-                try:
-                    detection_task = asyncio.create_task(process_frame_detection(frame))
-                    depth_task = asyncio.create_task(process_frame_depth(frame))
-                    
-                    results, detection_text = await detection_task
-                    depth_result = await depth_task
-
-                    if results is not None and active_clients[client_id].is_active:
-                        depth_info = ""
-                        if isinstance(depth_result, dict) and depth_result.get("depth"):
-                            depth_info = f" | Distance: {depth_result['depth']:.1f}cm"
-                        
-                        full_text = detection_text + depth_info if detection_text else "No objects detected"
-                        translated_text = await process_translation(full_text, target_lang)
-
-                        # Send response
-                        if websocket.client_state.CONNECTED:
-                            await websocket.send_json({
-                                "depth": depth_result.get("depth") if isinstance(depth_result, dict) else None,
-                                "confidence": depth_result.get("confidence", 0) if isinstance(depth_result, dict) else 0,
-                                "method": depth_result.get("method", "none") if isinstance(depth_result, dict) else "none",
-                                "translated_text": translated_text,
-                                "status": "success"
-                            })
-                except Exception as e:
-                    print(f"❌ Processing error: {str(e)}")
-                    if websocket.client_state.CONNECTED:
-                        await websocket.send_json({
-                            "error": str(e),
-                            "status": "error"
-                        })
-                    continue
-
-            except WebSocketDisconnect:
-                print(f"🔒 WebSocket disconnect: {client_id}")
-                break
-            except Exception as e:
-                print(f"❌ Unexpected error: {str(e)}")
-                break
+                await stale.close(code=4000, reason="session resumed on another connection")
+            except Exception:
+                pass
+        if target_lang:
+            client.target_lang = target_lang
+        if grid and client.grid is None:
+            client.grid = ObstacleGrid()
+        if facemesh and client.facemesh is None:
+            client.facemesh = await asyncio.get_event_loop().run_in_executor(facemesh_executor, create_stage)
+        client.websocket = websocket
+        client.encoder = encoder
+        client.is_active = True
+        processing_queues[session_id] = queue
+        touch_session(session_id)
+        await send_session(session_id, resumed)
+        print(
+            f"✅ WebSocket connected: {session_id}{' (resumed)' if resumed else ''} "
+            f"(target: {client.target_lang}, results: {encoding}{', delta' if delta else ''})"
+        )
+
+        # Receive, inference and send run concurrently; whichever stops first ends the connection
+        tasks = [
+            asyncio.create_task(receive_frames(websocket, session_id, queue)),
+            asyncio.create_task(infer_frames(session_id, queue)),
+            asyncio.create_task(send_results(websocket, queue, encoder)),
+        ]
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+
+    except WebSocketDisconnect:
+        print(f"🔒 WebSocket disconnect: {session_id}")
+    except Exception as e:
+        print(f"❌ Unexpected error: {str(e)}")
 
     finally:
         # Cleanup
+        for task in tasks:
+            task.cancel()
         try:
-            if client_id in active_clients:
-                del active_clients[client_id]
-            if client_id in processing_queues:
-                del processing_queues[client_id]
-            print(f"🧹 Connection cleaned up: {client_id}")
+            if processing_queues.get(session_id) is queue:
+                del processing_queues[session_id]
+            client = active_clients.get(session_id)
+            if client is not None and client.websocket is websocket:
+                # Kept for a reconnect with the same token; evicted if none comes
+                client.websocket = None
+                client.encoder = None
+                touch_session(session_id)
+            print(
+                f"🧹 Connection cleaned up: {session_id} "
+                f"({queue.frames_received} frames, {queue.frames_dropped} dropped)"
+            )
         except Exception as e:
             print(f"❌ Cleanup error: {str(e)}")
 
 # Add graceful shutdown
 @app.on_event("shutdown")
 async def shutdown_event():
+    await session_evictor.stop()
+    await stop_dispatcher()
+    if worker_pool is not None:
+        worker_pool.stop()
+    await detection_batcher.stop()
+    await depth_batcher.stop()
     detection_executor.shutdown(wait=True)
     depth_executor.shutdown(wait=True)
     translation_executor.shutdown(wait=True)
+    facemesh_executor.shutdown(wait=True)
 
 @app.get("/depth")
 async def get_depth_value():
@@ -258,35 +808,55 @@ async def get_depth_value():
         return {"error": "Failed to capture depth"}
     return {"estimated_distance_cm": distance}
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus scrape target: per-stage latency, drops, queue depth, executor load."""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/")
 async def root():
-    return {"status": "running", "connections": len(active_clients)}
-
-# Add cleanup task
-async def cleanup_inactive_clients():
-    while True:
-        try:
-            current_time = datetime.now()
-            inactive_threshold = timedelta(seconds=30)
-            
-            for client_id, state in list(active_clients.items()):
-                try:
-                    if (current_time - state.last_active) > inactive_threshold:
-                        print(f"🧹 Removing inactive client: {client_id}")
-                        if client_id in active_clients:
-                            del active_clients[client_id]
-                        if client_id in processing_queues:
-                            del processing_queues[client_id]
-                except Exception as e:
-                    print(f"❌ Client cleanup error: {client_id} - {str(e)}")
-                    continue
-            
-            await asyncio.sleep(10)
-        except Exception as e:
-            print(f"❌ Main cleanup error: {str(e)}")
-            await asyncio.sleep(10)
+    return {"status": "running", "connections": len(processing_queues), "sessions": len(active_clients)}
 
 # Add to your startup events
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(cleanup_inactive_clients())
\ No newline at end of file
+    session_evictor.start()
+    await start_dispatcher()
+    if worker_pool is not None:
+        worker_pool.start()
+    asyncio.create_task(preload_models())
+
+async def preload_models():
+    """Load and warm up models in the background while sockets are already accepted."""
+    loop = asyncio.get_event_loop()
+    if worker_pool is not None:
+        try:
+            await worker_pool.wait_ready()
+        except RuntimeError as e:
+            print(f"❌ Inference workers failed to start: {str(e)}")
+            return
+    elif PRELOAD_MODELS:
+        # The model threads are idle at startup; each loads its own model in parallel
+        await asyncio.gather(
+            loop.run_in_executor(detection_executor, registry.get, "yolo"),
+            loop.run_in_executor(depth_executor, registry.get, "depth"),
+            return_exceptions=True
+        )
+    else:
+        return
+    if WARM_LANGUAGES:
+        engine = await get_phrase_engine()
+        await loop.run_in_executor(translation_executor, engine.warm, WARM_LANGUAGES)
+
+@app.get("/ready")
+async def ready():
+    """Readiness for load balancers: 200 once every model is loaded and warmed up."""
+    if worker_pool is not None:
+        workers = worker_pool.status()
+        is_ready = any(state == "ready" for state in workers.values())
+        body = {"ready": is_ready, "workers": workers}
+    else:
+        is_ready = registry.is_ready()
+        body = {"ready": is_ready, "models": registry.status()}
+    return JSONResponse(body, status_code=200 if is_ready else 503)
\ No newline at end of file
@@ -0,0 +1,222 @@
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from models import registry, warmup_frame
+
+# "torch" (eager PyTorch, the default), "onnx" (ONNX Runtime) or "openvino"
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch").lower()
+# Quantize weights to int8 when exporting for the onnx/openvino backends
+INFERENCE_INT8 = os.environ.get("INFERENCE_INT8", "0").lower() in ("1", "true", "yes")
+# Exported models are written here on first run and reused afterwards
+MODEL_CACHE_DIR = Path(os.environ.get("MODEL_CACHE_DIR", "model_cache"))
+# Default to YOLOv8n if no custom model is given
+YOLO_MODEL_PATH = os.environ.get("YOLO_MODEL_PATH", "yolov8n.pt")
+# Ultralytics dataset used to calibrate the OpenVINO int8 YOLO export
+INT8_CALIBRATION_DATA = os.environ.get("INT8_CALIBRATION_DATA", "coco8.yaml")
+BACKENDS = ("torch", "onnx", "openvino")
+YOLO_EXPORT_IMGSZ = 640
+
+def _variant(int8):
+    return "int8" if int8 else "fp32"
+
+def _check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+@contextmanager
+def _export_lock(target):
+    """Exclusive lock on `target`.lock, so one process exports `target` while the others wait.
+
+    With INFERENCE_WORKERS > 1 every worker loads its models at once and
+    would otherwise export to the same files together.
+    """
+    MODEL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(f"{target}.lock", "a+b") as lock_file:
+        try:
+            import fcntl
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        except ImportError:
+            import msvcrt
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.5)
+        # Released when the file is closed
+        yield
+
+def quantize_onnx(source, target, weight_type, op_types=None):
+    """Dynamic int8 quantization: int8 weights, activations quantized at run time."""
+    from onnxruntime.quantization import quantize_dynamic
+
+    print(f"🔄 Quantizing {source} to int8")
+    quantize_dynamic(
+        str(source),
+        str(target),
+        weight_type=weight_type,
+        op_types_to_quantize=op_types
+    )
+
+def export_yolo(model_path, backend=INFERENCE_BACKEND, int8=INFERENCE_INT8):
+    """Export a YOLO checkpoint for `backend` once and return the cached path."""
+    from ultralytics import YOLO
+
+    _check_backend(backend)
+    stem = Path(model_path).stem
+    MODEL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    if backend == "onnx":
+        fp32_path = MODEL_CACHE_DIR / f"{stem}.onnx"
+        # Ultralytics exports next to the checkpoint, so the lock covers the move as well
+        with _export_lock(fp32_path):
+            if not fp32_path.exists():
+                print(f"🔄 Exporting {model_path} to ONNX")
+                exported = YOLO(model_path).export(format="onnx", dynamic=True, imgsz=YOLO_EXPORT_IMGSZ)
+                shutil.move(exported, fp32_path)
+        if not int8:
+            return fp32_path
+        int8_path = MODEL_CACHE_DIR / f"{stem}.int8.onnx"
+        with _export_lock(int8_path):
+            if not int8_path.exists():
+                from onnxruntime.quantization import QuantType
+                # ONNX Runtime's CPU ConvInteger kernel only takes uint8 weights
+                quantize_onnx(fp32_path, int8_path, QuantType.QUInt8)
+        return int8_path
+
+    if backend == "openvino":
+        # Ultralytics recognizes OpenVINO models by the _openvino_model suffix
+        target = MODEL_CACHE_DIR / f"{stem}_{_variant(int8)}_openvino_model"
+        with _export_lock(target):
+            if not target.exists():
+                print(f"🔄 Exporting {model_path} to OpenVINO ({_variant(int8)})")
+                # int8 export calibrates activations with NNCF on INT8_CALIBRATION_DATA
+                exported = YOLO(model_path).export(
+                    format="openvino",
+                    dynamic=True,
+                    int8=int8,
+                    data=INT8_CALIBRATION_DATA,
+                    imgsz=YOLO_EXPORT_IMGSZ
+                )
+                shutil.move(exported, target)
+        return target
+
+    return Path(model_path)
+
+def load_yolo(model_path, backend=INFERENCE_BACKEND, int8=INFERENCE_INT8):
+    """YOLO model for the chosen backend; results look the same for every backend."""
+    from ultralytics import YOLO
+
+    if backend == "torch":
+        return YOLO(model_path)
+    return YOLO(str(export_yolo(model_path, backend, int8)), task="detect")
+
+def load_detection_model():
+    print(f"🔄 Loading YOLO model from {YOLO_MODEL_PATH} ({INFERENCE_BACKEND}{', int8' if INFERENCE_INT8 else ''})")
+    # Exported for INFERENCE_BACKEND on first run
+    return load_yolo(YOLO_MODEL_PATH)
+
+registry.register(
+    "yolo",
+    load_detection_model,
+    warmup=lambda model: model([warmup_frame()], verbose=False)
+)
+
+def export_depth_onnx(model_path, input_size):
+    """Export the depth model to ONNX with a dynamic batch axis, once."""
+    width, height = input_size
+    stem = Path(model_path).name
+    target = MODEL_CACHE_DIR / f"{stem}_{width}x{height}.onnx"
+    if target.exists():
+        return target
+    with _export_lock(target):
+        if not target.exists():
+            _export_depth_onnx(model_path, width, height, target)
+    return target
+
+def _export_depth_onnx(model_path, width, height, target):
+    import torch
+    from transformers import AutoModelForDepthEstimation
+
+    class PredictedDepth(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            return self.model(pixel_values=pixel_values).predicted_depth
+
+    print(f"🔄 Exporting {model_path} to ONNX")
+    model = AutoModelForDepthEstimation.from_pretrained(model_path).eval()
+    with torch.inference_mode():
+        torch.onnx.export(
+            PredictedDepth(model),
+            (torch.zeros(1, 3, height, width),),
+            str(target),
+            input_names=["pixel_values"],
+            output_names=["predicted_depth"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "predicted_depth": {0: "batch"}},
+            opset_version=17,
+            dynamo=False
+        )
+
+def export_depth(model_path, input_size, backend=INFERENCE_BACKEND, int8=INFERENCE_INT8):
+    """Export the depth model for `backend` once and return the cached path."""
+    _check_backend(backend)
+    onnx_path = export_depth_onnx(model_path, input_size)
+
+    if backend == "onnx":
+        if not int8:
+            return onnx_path
+        int8_path = onnx_path.with_suffix(".int8.onnx")
+        with _export_lock(int8_path):
+            if not int8_path.exists():
+                from onnxruntime.quantization import QuantType
+                # The ViT encoder is almost all MatMul; the conv decoder stays fp32
+                quantize_onnx(onnx_path, int8_path, QuantType.QInt8, op_types=["MatMul", "Gemm"])
+        return int8_path
+
+    if backend == "openvino":
+        import openvino as ov
+
+        xml_path = onnx_path.with_name(f"{onnx_path.stem}_{_variant(int8)}.xml")
+        with _export_lock(xml_path):
+            if not xml_path.exists():
+                print(f"🔄 Converting {onnx_path} to OpenVINO ({_variant(int8)})")
+                ov_model = ov.Core().read_model(str(onnx_path))
+                if int8:
+                    import nncf
+                    ov_model = nncf.compress_weights(ov_model)
+                ov.save_model(ov_model, str(xml_path))
+        return xml_path
+
+    return onnx_path
+
+class OnnxDepthRunner:
+    def __init__(self, path):
+        import onnxruntime as ort
+
+        self.session = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, pixel_values):
+        return self.session.run(None, {self.input_name: pixel_values})[0]
+
+class OpenVinoDepthRunner:
+    def __init__(self, path):
+        import openvino as ov
+
+        self.model = ov.Core().compile_model(str(path), "CPU")
+
+    def __call__(self, pixel_values):
+        return self.model(pixel_values)[0]
+
+def load_depth_runner(model_path, input_size, backend=INFERENCE_BACKEND, int8=INFERENCE_INT8):
+    """Callable mapping normalized NCHW float32 pixels to (N, H, W) depth maps."""
+    path = export_depth(model_path, input_size, backend, int8)
+    if backend == "onnx":
+        return OnnxDepthRunner(path)
+    return OpenVinoDepthRunner(path)
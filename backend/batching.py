@@ -0,0 +1,101 @@
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, List, Optional
+
+from metrics import batch_seconds, batch_size, queue_depth
+
+
+class MicroBatcher:
+    """Collects items submitted by many clients and runs them as one batched call.
+
+    A batch is flushed as soon as `max_batch` items are waiting or `window_ms`
+    has passed since the first item of the batch arrived. The batch function
+    runs in `executor`, so model inference never blocks the event loop, and
+    each caller gets back the result for its own item.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run_batch: Callable[[List[Any]], List[Any]],
+        executor: Executor,
+        max_batch: int = 8,
+        window_ms: float = 15.0,
+    ):
+        self.name = name
+        self.run_batch = run_batch
+        self.executor = executor
+        self.max_batch = max(1, max_batch)
+        self.window = max(0.0, window_ms) / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        queue_depth.labels(name).set_function(lambda: self._queue.qsize() if self._queue else 0)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result from the next batch."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self, loop: asyncio.AbstractEventLoop) -> list:
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Callers that gave up (socket closed, cancelled) don't need a slot
+        return [(item, future) for item, future in batch if not future.done()]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect(loop)
+            if not batch:
+                continue
+            batch_size.labels(self.name).observe(len(batch))
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(
+                    self.executor,
+                    self.run_batch,
+                    [item for item, _ in batch]
+                )
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"expected {len(batch)} results, got {len(results)}"
+                    )
+            except Exception as e:
+                print(f"❌ {self.name} batch error: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            batch_seconds.labels(self.name).observe(time.perf_counter() - start)
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
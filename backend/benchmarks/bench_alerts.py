@@ -0,0 +1,94 @@
+"""Emergency fan-out: one contact at a time against the alert dispatcher.
+
+Run from backend/, e.g.:
+
+    python benchmarks/bench_alerts.py --contacts 5 --latency-ms 400 --fail-rate 0.2
+
+Both runs go through the real Twilio transport, pointed at the fake server
+in fake_twilio.py in-process, so no message leaves the machine. The
+sequential run is what the app did before: one request per recipient,
+each waiting for the last. The dispatcher run submits one alert and then
+waits for its retries, so it also shows how long failures take to clear.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+import common  # puts backend/ on sys.path
+from alerts import AlertDispatcher, AlertQueue, TwilioTransport
+from fake_twilio import create_app
+
+def transport(app, concurrency):
+    return TwilioTransport(
+        "ACfake", "token", "+15550000000",
+        base_url="http://fake-twilio",
+        concurrency=concurrency,
+        http_transport=httpx.ASGITransport(app=app)
+    )
+
+async def sequential(app, contacts, channels, message):
+    twilio = transport(app, 1)
+    start = time.perf_counter()
+    failures = 0
+    for to in contacts:
+        for channel in channels:
+            try:
+                await twilio.send(channel, to, message)
+            except Exception:
+                failures += 1
+    elapsed = time.perf_counter() - start
+    await twilio.close()
+    return elapsed, failures
+
+async def dispatched(app, contacts, channels, message, args):
+    dispatcher = AlertDispatcher(
+        transport(app, args.concurrency),
+        AlertQueue(""),
+        concurrency=args.concurrency,
+        retry_base=args.retry_base
+    )
+    dispatcher.start()
+    start = time.perf_counter()
+    alert_id, deliveries = await dispatcher.submit(message, contacts, channels)
+    first_round = time.perf_counter() - start
+    first_failures = sum(delivery["status"] != "sent" for delivery in deliveries)
+    while any(delivery["status"] in ("pending", "sending") for delivery in deliveries):
+        await asyncio.sleep(0.05)
+        deliveries = dispatcher.queue.status(alert_id)
+    settled = time.perf_counter() - start
+    await dispatcher.stop()
+    return first_round, first_failures, settled, deliveries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=5)
+    parser.add_argument("--channels", default="sms,whatsapp", help="comma-separated: call, sms, whatsapp")
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="fake Twilio time per request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of fake Twilio requests that 503")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--retry-base", type=float, default=0.2, help="first retry delay in seconds")
+    args = parser.parse_args()
+
+    contacts = [f"+1555010{i:04d}" for i in range(args.contacts)]
+    channels = args.channels.split(",")
+    message = "Fall detected. Please check on me."
+
+    seq_time, seq_failures = asyncio.run(
+        sequential(create_app(args.latency_ms, args.fail_rate, seed=0), contacts, channels, message)
+    )
+    first_round, first_failures, settled, deliveries = asyncio.run(
+        dispatched(create_app(args.latency_ms, args.fail_rate, seed=0), contacts, channels, message, args)
+    )
+
+    total = len(contacts) * len(channels)
+    sent = sum(delivery["status"] == "sent" for delivery in deliveries)
+    print(f"\n{total} deliveries, {args.latency_ms:.0f} ms per request, fail rate {args.fail_rate:.0%}")
+    print(f"sequential   {seq_time:7.2f} s  ({seq_failures} failed, no retry)")
+    print(f"dispatcher   {first_round:7.2f} s  first attempts ({first_failures} to retry)")
+    print(f"             {settled:7.2f} s  settled ({sent}/{total} sent, "
+          f"{sum(delivery['attempts'] for delivery in deliveries)} attempts)")
+
+if __name__ == "__main__":
+    main()
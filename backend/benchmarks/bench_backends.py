@@ -0,0 +1,100 @@
+"""Compare YOLO and depth throughput across inference backends.
+
+Run from backend/, e.g.:
+
+    python benchmarks/bench_backends.py --backends torch onnx openvino --int8
+
+Every backend/precision pair is timed on the same frames. Depth output is
+checked against the PyTorch maps so a fast but broken export is obvious.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from common import load_frames  # also puts backend/ on sys.path
+from backends import BACKENDS, load_yolo
+from depth import DEPTH_INPUT_SIZE, DEPTH_MODEL_PATH, DepthEngine
+
+def time_batches(run, frames, batch_size, iterations, warmup=2):
+    batches = [frames[i:i + batch_size] for i in range(0, len(frames), batch_size)]
+    for _ in range(warmup):
+        run(batches[0])
+    latencies = []
+    for i in range(iterations):
+        batch = batches[i % len(batches)]
+        start = time.perf_counter()
+        run(batch)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies)
+    return {
+        "batch_ms": float(np.median(latencies) * 1000),
+        "fps": float(batch_size / np.median(latencies)),
+    }
+
+def relative_error(maps, reference):
+    if reference is None:
+        return None
+    return float(max(
+        np.abs(a - b).mean() / (np.abs(b).mean() + 1e-6)
+        for a, b in zip(maps, reference)
+    ))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--int8", action="store_true", help="also time int8 exports")
+    parser.add_argument("--yolo-model", default=os.environ.get("YOLO_MODEL_PATH", "yolov8n.pt"))
+    parser.add_argument("--depth-model", default=DEPTH_MODEL_PATH)
+    parser.add_argument("--frames", help="directory of JPEG frames (default: synthetic)")
+    parser.add_argument("--batch", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, max(args.batch * 4, 8))
+    if not frames:
+        sys.exit(f"No frames found in {args.frames}")
+
+    configs = [(backend, False) for backend in args.backends]
+    if args.int8:
+        configs += [(backend, True) for backend in args.backends if backend != "torch"]
+
+    rows = []
+    reference_maps = None
+    for backend, int8 in configs:
+        label = f"{backend}{'-int8' if int8 else ''}"
+        print(f"🔄 {label}: loading models")
+        try:
+            yolo = load_yolo(args.yolo_model, backend, int8)
+            engine = DepthEngine(args.depth_model, DEPTH_INPUT_SIZE, backend=backend, int8=int8)
+        except Exception as e:
+            print(f"❌ {label}: {str(e)}")
+            continue
+
+        detection = time_batches(lambda batch: yolo(batch, verbose=False), frames, args.batch, args.iterations)
+        depth = time_batches(engine.infer, frames, args.batch, args.iterations)
+
+        maps = engine.infer(frames[:args.batch])
+        if backend == "torch" and not int8:
+            reference_maps = maps
+        rows.append((label, detection, depth, relative_error(maps, reference_maps)))
+
+    baseline = {label: (det, dep) for label, det, dep, _ in rows}.get("torch")
+    print()
+    print(f"{'backend':<16}{'yolo ms/batch':>14}{'yolo fps':>10}{'depth ms/batch':>16}{'depth fps':>11}{'speedup':>9}{'depth err':>11}")
+    for label, detection, depth, error in rows:
+        speedup = ""
+        if baseline:
+            total = detection["batch_ms"] + depth["batch_ms"]
+            speedup = f"{(baseline[0]['batch_ms'] + baseline[1]['batch_ms']) / total:.2f}x"
+        error_text = f"{error:.3f}" if error is not None else "-"
+        print(
+            f"{label:<16}{detection['batch_ms']:>14.1f}{detection['fps']:>10.1f}"
+            f"{depth['batch_ms']:>16.1f}{depth['fps']:>11.1f}{speedup:>9}{error_text:>11}"
+        )
+    print(f"\nbatch={args.batch}, frames={len(frames)}, iterations={args.iterations}")
+
+if __name__ == "__main__":
+    main()
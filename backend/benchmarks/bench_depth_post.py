@@ -0,0 +1,114 @@
+"""Depth post-processing: the previous full-map path against depth_from_map.
+
+Run from backend/, e.g.:
+
+    python benchmarks/bench_depth_post.py --objects 5 --iterations 500
+
+The reference path is the one depth_from_map used before: a 5x5 Gaussian
+blur, two np.percentile calls and a full-size normalized float64 map. Both
+paths get the same synthetic maps at the model's output resolution. The
+distances they report are compared so the speedup isn't bought with
+accuracy.
+"""
+import argparse
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from common import summarize
+from depth import DEPTH_INPUT_SIZE, box_means, depth_from_map, normalized_to_distance
+
+def reference_normalized(depth_map):
+    depth_map = cv2.GaussianBlur(depth_map, (5, 5), 0)
+    depth_min = np.percentile(depth_map, 5)
+    depth_max = np.percentile(depth_map, 95)
+    return np.clip((depth_map - depth_min) * 255 / (depth_max - depth_min), 0, 255)
+
+def reference_distances(depth_map, boxes):
+    """Scene distance and per-box AI distances as the old code computed them."""
+    normalized = reference_normalized(depth_map)
+    h, w = normalized.shape
+    ai_depth = (
+        0.5 * np.mean(normalized[h//3:2*h//3, w//3:2*w//3]) +
+        0.3 * np.mean(normalized[2*h//3:, w//3:2*w//3]) +
+        0.2 * np.mean(normalized[:h//3, w//3:2*w//3])
+    )
+    object_distances = []
+    if len(boxes):
+        integral = cv2.integral(normalized, sdepth=cv2.CV_64F)
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        half_sizes = (boxes[:, 2:] - boxes[:, :2]) / 4
+        inner = np.concatenate([centers - half_sizes, centers + half_sizes], axis=1)
+        object_distances = normalized_to_distance(box_means(integral, inner)).tolist()
+    return float(normalized_to_distance(ai_depth)), object_distances
+
+def synthetic_maps(count, size):
+    """Relative depth like the model's: a floor gradient, a few blobs, noise."""
+    width, height = size
+    rng = np.random.default_rng(0)
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    maps = []
+    for _ in range(count):
+        depth_map = 2.0 + 6.0 * ys / height
+        for _ in range(3):
+            cx, cy, r = rng.uniform(0, width), rng.uniform(0, height), rng.uniform(20, 80)
+            depth_map += rng.uniform(2, 6) * np.exp(-((xs - cx) ** 2 + (ys - cy) ** 2) / (2 * r * r))
+        depth_map += rng.normal(0, 0.3, depth_map.shape).astype(np.float32)
+        maps.append(depth_map.astype(np.float32))
+    return maps
+
+def synthetic_objects(count, size):
+    width, height = size
+    rng = np.random.default_rng(1)
+    objects = []
+    for i in range(count):
+        x1, y1 = rng.uniform(0, width * 0.7), rng.uniform(0, height * 0.7)
+        x2, y2 = x1 + rng.uniform(30, width * 0.3), y1 + rng.uniform(30, height * 0.3)
+        objects.append({"class": "potted plant" if i % 2 else "vase", "confidence": 0.8, "box": [x1, y1, x2, y2]})
+    return objects
+
+def time_calls(run, maps, iterations):
+    latencies = []
+    for i in range(iterations):
+        depth_map = maps[i % len(maps)]
+        start = time.perf_counter()
+        run(depth_map)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--maps", type=int, default=8)
+    args = parser.parse_args()
+
+    maps = synthetic_maps(args.maps, DEPTH_INPUT_SIZE)
+    objects = synthetic_objects(args.objects, DEPTH_INPUT_SIZE)
+    boxes = np.array([obj["box"] for obj in objects], dtype=np.float64)
+
+    reference = time_calls(lambda m: reference_distances(m, boxes), maps, args.iterations)
+    # A fresh buffer per call keeps temporal smoothing out of the comparison
+    fast = time_calls(lambda m: depth_from_map(m, objects, DEPTH_INPUT_SIZE, deque(maxlen=1)), maps, args.iterations)
+
+    scene_errors, object_errors = [], []
+    for depth_map in maps:
+        ref_scene, ref_objects = reference_distances(depth_map, boxes)
+        result = depth_from_map(depth_map, objects, DEPTH_INPUT_SIZE, deque(maxlen=1))
+        scene_errors.append(abs(result["depth"] - ref_scene))
+        # Unknown-width classes, so object distances are pure depth-map estimates
+        fast_objects = sorted(obj["distance"] for obj in result["objects"])
+        object_errors.extend(abs(a - b) for a, b in zip(fast_objects, sorted(ref_objects)))
+
+    print(f"\n{'path':<12}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for label, summary in (("reference", reference), ("fast", fast)):
+        print(f"{label:<12}{summary['p50_ms']:>10.3f}{summary['p95_ms']:>10.3f}{summary['mean_ms']:>10.3f}")
+    print(f"\nspeedup {reference['p50_ms'] / fast['p50_ms']:.1f}x at {DEPTH_INPUT_SIZE[0]}x{DEPTH_INPUT_SIZE[1]}, {args.objects} objects")
+    print(f"max scene distance difference {max(scene_errors):.2f} cm")
+    if object_errors:
+        print(f"max object distance difference {max(object_errors):.2f} cm")
+
+if __name__ == "__main__":
+    main()
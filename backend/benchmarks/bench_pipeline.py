@@ -0,0 +1,243 @@
+"""Offline microbenchmarks for the per-frame pipeline.
+
+Run from backend/, e.g.:
+
+    python benchmarks/bench_pipeline.py --model-ms 20 --translate-ms 150 --json before.json
+    ... change something ...
+    python benchmarks/bench_pipeline.py --model-ms 20 --translate-ms 150 --baseline before.json
+
+YOLO, the depth model and the translator are replaced by stubs with fixed
+costs (--model-ms, --translate-ms). Nothing is downloaded and no GPU is
+needed, so the numbers show the server's own overhead: batching, decoding
+and post-processing, and the caching around translation.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from itertools import count
+
+import numpy as np
+
+# Before the app modules are imported: no network, no on-disk translation cache
+os.environ.setdefault("TRANSLATION_UPSTREAM", "identity")
+os.environ.setdefault("TRANSLATION_CACHE_PATH", "")
+
+from common import compare_to_baseline, load_frames, summarize, write_json
+import app
+from depth import DEPTH_INPUT_SIZE, get_depth
+from models import registry
+import translation
+
+# A few COCO classes are enough for the post-processing paths
+STUB_NAMES = {0: "person", 1: "bicycle", 2: "car", 56: "chair", 62: "tv"}
+
+class StubArray:
+    """Stands in for a torch tensor: `.cpu().numpy()` gives the array back."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+class StubBoxes:
+    def __init__(self, xyxy, cls, conf):
+        self.xyxy = StubArray(xyxy)
+        self.cls = StubArray(cls)
+        self.conf = StubArray(conf)
+
+    def __len__(self):
+        return len(self.cls)
+
+    def __iter__(self):
+        for cls in self.cls.values:
+            yield StubBox(cls)
+
+class StubBox:
+    def __init__(self, cls):
+        self.cls = cls
+
+class StubResults:
+    def __init__(self, boxes):
+        self.names = STUB_NAMES
+        self.boxes = boxes
+
+class StubDetector:
+    """Called like an ultralytics YOLO model; returns a fixed set of boxes per frame."""
+
+    def __init__(self, model_ms, objects):
+        self.model_ms = model_ms
+        self.objects = objects
+        rng = np.random.default_rng(0)
+        classes = list(STUB_NAMES)
+        self.cls = np.array([classes[i % len(classes)] for i in range(objects)], dtype=np.float32)
+        self.conf = rng.uniform(0.4, 0.95, objects).astype(np.float32)
+        top_left = rng.uniform(0, 400, (objects, 2))
+        self.xyxy = np.concatenate([top_left, top_left + rng.uniform(40, 200, (objects, 2))], axis=1).astype(np.float32)
+
+    def __call__(self, frames, imgsz=None, verbose=False):
+        time.sleep(self.model_ms / 1000.0)
+        return [StubResults(StubBoxes(self.xyxy, self.cls, self.conf)) for _ in frames]
+
+class StubDepthEngine:
+    """Same interface as DepthEngine; depth maps are a smooth ramp with noise."""
+
+    def __init__(self, model_ms, input_size=DEPTH_INPUT_SIZE):
+        self.model_ms = model_ms
+        width, height = input_size
+        rng = np.random.default_rng(0)
+        ramp = np.linspace(1.0, 8.0, height, dtype=np.float32)[:, None]
+        self.depth_map = ramp + rng.normal(0, 0.2, (height, width)).astype(np.float32)
+
+    def infer(self, frames, input_size=None):
+        time.sleep(self.model_ms / 1000.0)
+        return [self.depth_map.copy() for _ in frames]
+
+class StubUpstream:
+    """Translator with a fixed network round trip per batch."""
+
+    def __init__(self, latency_ms):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def translate_batch(self, texts, target_lang):
+        self.calls += 1
+        time.sleep(self.latency_ms / 1000.0)
+        return [f"[{target_lang}] {text}" for text in texts]
+
+def time_calls(run, iterations):
+    """Timings of `run`; calls that return None are counted under "errors"."""
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        if run() is None:
+            errors += 1
+        latencies.append(time.perf_counter() - call_start)
+    return {**summarize(latencies, time.perf_counter() - start), "errors": errors}
+
+async def time_concurrent(run, clients, rounds):
+    """`clients` callers at once per round, like sockets sharing the micro-batchers."""
+    latencies = []
+    errors = 0
+
+    async def timed_call():
+        nonlocal errors
+        call_start = time.perf_counter()
+        if await run() is None:
+            errors += 1
+        latencies.append(time.perf_counter() - call_start)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(timed_call() for _ in range(clients)))
+    return {**summarize(latencies, time.perf_counter() - start), "errors": errors}
+
+async def bench_detection(frames, args):
+    async def detect_one():
+        # None when the detection failed
+        results, _ = await app.process_frame_detection(frames[0])
+        return results
+
+    try:
+        results = {"detection.single": await time_concurrent(detect_one, 1, args.iterations)}
+        results["detection.concurrent"] = await time_concurrent(detect_one, args.clients, args.iterations)
+    finally:
+        await app.detection_batcher.stop()
+    return results
+
+def bench_depth(frames, detector, args):
+    objects = [
+        {"class": STUB_NAMES[int(cls)], "confidence": float(conf), "box": box.tolist()}
+        for box, cls, conf in zip(detector.xyxy, detector.cls, detector.conf)
+    ]
+    frame = frames[0]
+    return {
+        "get_depth": time_calls(lambda: get_depth(frame)["depth"], args.iterations),
+        "get_depth.objects": time_calls(lambda: get_depth(frame, objects)["depth"], args.iterations),
+    }
+
+def bench_translation(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        upstream = StubUpstream(args.translate_ms)
+        cache_path = os.path.join(tmp, "translations.sqlite3")
+        translation.translation_service = translation.TranslationService(upstream, cache_path)
+        unique = count()
+
+        # Every text new: one upstream round trip per call
+        results["translate.miss"] = time_calls(
+            lambda: translation.translate_text(f"object {next(unique)}", "hi"),
+            args.iterations
+        )
+        # Same text again: served from memory
+        results["translate.memory_hit"] = time_calls(
+            lambda: translation.translate_text("object 0", "hi"),
+            args.iterations * 10
+        )
+        # Fresh process, warm SQLite cache: served from disk on first use
+        translation.translation_service = translation.TranslationService(upstream, cache_path, memory_size=0)
+        results["translate.sqlite_hit"] = time_calls(
+            lambda: translation.translate_text("object 0", "hi"),
+            args.iterations * 10
+        )
+        print(f"🔄 Stub translator called {upstream.calls} times")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-ms", type=float, default=0.0, help="stub YOLO and depth cost per batch")
+    parser.add_argument("--translate-ms", type=float, default=100.0, help="stub translator round trip")
+    parser.add_argument("--objects", type=int, default=5, help="boxes the stub detector returns")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent callers for the batching benchmark")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--frames", help="directory of JPEG frames (default: synthetic)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown vs the baseline")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, 4)
+    detector = StubDetector(args.model_ms, args.objects)
+    registry.register("yolo", lambda: detector)
+    registry.register("depth", lambda: StubDepthEngine(args.model_ms))
+
+    results = {}
+    results.update(asyncio.run(bench_detection(frames, args)))
+    results.update(bench_depth(frames, detector, args))
+    results.update(bench_translation(args))
+
+    print(f"\n{'benchmark':<24}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'calls/s':>10}")
+    for name, summary in results.items():
+        print(
+            f"{name:<24}{summary['count']:>7}{summary['p50_ms']:>10.3f}{summary['p95_ms']:>10.3f}"
+            f"{summary['p99_ms']:>10.3f}{summary['per_second']:>10.1f}"
+        )
+    print(f"\nmodel={args.model_ms}ms, translate={args.translate_ms}ms, objects={args.objects}, clients={args.clients}")
+
+    failed = {name: summary["errors"] for name, summary in results.items() if summary.get("errors")}
+    if failed:
+        # Timings of failing calls measure the error path, not the pipeline
+        print(f"❌ Calls returned no result: {failed}")
+        sys.exit(1)
+
+    if args.json:
+        write_json(args.json, results)
+    if args.baseline and compare_to_baseline(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Real models under concurrent load, with and without the CPU thread budget.
+
+Run from backend/, e.g.:
+
+    python benchmarks/bench_threads.py --clients 8 --rounds 20 --frames frames_dir/
+
+Each configuration runs in a fresh process, because torch and OpenCV fix
+their thread pools on first use. "default" is THREAD_BUDGET=0: every
+torch call starts a pool across all cores, so two detection and two depth
+batches running together ask for four times the cores there are.
+"budget" splits the cores between the stages as the server does (see
+compute.py; DETECTION_CPU_SHARE, DEPTH_CPU_SHARE and CPU_BUDGET apply).
+Per frame a client runs detection and depth together and then the depth
+post-processing, like /ws/video. The difference shows on machines with
+several cores; with one core both runs share it the same way.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+CONFIGS = {"default": "0", "budget": "1"}
+
+async def run_child(args):
+    from collections import deque
+
+    from common import load_frames, summarize
+    import app
+    from depth import detected_objects_from_results
+    from models import registry
+
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        loop.run_in_executor(app.detection_executor, registry.get, "yolo"),
+        loop.run_in_executor(app.depth_executor, registry.get, "depth"),
+    )
+    frames = load_frames(args.frames, args.clients)
+    buffers = [deque(maxlen=8) for _ in frames]
+
+    async def one_frame(client):
+        frame = frames[client % len(frames)]
+        (results, _), depth_map = await asyncio.gather(
+            app.process_frame_detection(frame),
+            app.process_frame_depth(frame)
+        )
+        detected_objects = detected_objects_from_results(results) if results is not None else []
+        await app.process_fused_depth(depth_map, detected_objects, (frame.shape[1], frame.shape[0]), buffers[client])
+
+    # Warm-up round: first batches pay for lazy initialization
+    await asyncio.gather(*(one_frame(client) for client in range(args.clients)))
+
+    budget = app.compute_budget
+    if budget is not None:
+        for stage in budget.stages:
+            budget.utilization(stage)
+    latencies = []
+
+    async def timed_frame(client):
+        start = time.perf_counter()
+        await one_frame(client)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        await asyncio.gather(*(timed_frame(client) for client in range(args.clients)))
+    result = summarize(latencies, time.perf_counter() - start)
+    if budget is not None:
+        result["utilization"] = {stage: budget.utilization(stage) for stage in budget.stages}
+        result["cores"] = {stage: len(stage_budget.cores) for stage, stage_budget in budget.stages.items()}
+    await app.detection_batcher.stop()
+    await app.depth_batcher.stop()
+    print(json.dumps(result))
+
+def run_config(name, args):
+    env = dict(os.environ, THREAD_BUDGET=CONFIGS[name], INFERENCE_WORKERS="0", PRELOAD_MODELS="0")
+    command = [sys.executable, __file__, "--child", "--clients", str(args.clients), "--rounds", str(args.rounds)]
+    if args.frames:
+        command += ["--frames", args.frames]
+    print(f"🔄 {name} ...")
+    output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+    # The app prints its own startup lines; the result is the last one
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8, help="concurrent frames per round")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--frames", help="directory of JPEG frames (default: synthetic)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        import common  # puts backend/ on sys.path
+        os.chdir(common.BACKEND_DIR)
+        asyncio.run(run_child(args))
+        return
+
+    results = {name: run_config(name, args) for name in CONFIGS}
+    print(f"\n{os.cpu_count()} cores, {args.clients} clients x {args.rounds} rounds")
+    print(f"{'config':<10}{'frames/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, summary in results.items():
+        print(f"{name:<10}{summary['per_second']:>10.2f}{summary['p50_ms']:>10.1f}"
+              f"{summary['p95_ms']:>10.1f}{summary['p99_ms']:>10.1f}")
+    budget = results["budget"]
+    if "utilization" in budget:
+        print("\nbudget stage cores and utilization:")
+        for stage, utilization in budget["utilization"].items():
+            print(f"  {stage:<10}{budget['cores'][stage]:>4} cores {utilization:>6.0%}")
+    if args.json:
+        from common import write_json
+        write_json(args.json, results)
+
+if __name__ == "__main__":
+    main()
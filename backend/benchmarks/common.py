@@ -0,0 +1,83 @@
+"""Helpers shared by the benchmark scripts."""
+import json
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+def synthetic_frames(count, shape=(480, 640, 3)):
+    """Deterministic frames with some structure, so JPEG sizes look like a camera's."""
+    rng = np.random.default_rng(0)
+    h, w = shape[:2]
+    gradient = np.linspace(0, 255, w, dtype=np.float32)[None, :, None]
+    frames = []
+    for _ in range(count):
+        noise = rng.normal(0, 25, shape).astype(np.float32)
+        frames.append(np.clip(gradient + noise, 0, 255).astype(np.uint8))
+    return frames
+
+def frame_paths(frames_dir, count=None):
+    paths = sorted(Path(frames_dir).glob("*.jp*g"))
+    return paths[:count] if count else paths
+
+def load_frames(frames_dir, count):
+    """Decoded BGR frames from a directory of JPEGs, or synthetic ones without a directory."""
+    if frames_dir:
+        frames = [cv2.imread(str(path)) for path in frame_paths(frames_dir, count)]
+        return [frame for frame in frames if frame is not None]
+    return synthetic_frames(count)
+
+def load_jpegs(frames_dir, count, quality=50):
+    """Encoded JPEG bytes as a client would send them."""
+    if frames_dir:
+        return [path.read_bytes() for path in frame_paths(frames_dir, count)]
+    jpegs = []
+    for frame in synthetic_frames(count):
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            jpegs.append(encoded.tobytes())
+    return jpegs
+
+def summarize(latencies, elapsed=None):
+    """p50/p95/p99/mean in milliseconds, plus throughput when `elapsed` is given."""
+    if not latencies:
+        return {"count": 0}
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    summary = {
+        "count": len(values),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "mean_ms": float(values.mean()),
+    }
+    if elapsed:
+        summary["per_second"] = len(values) / elapsed
+    return summary
+
+def write_json(path, results):
+    Path(path).write_text(json.dumps(results, indent=2, sort_keys=True))
+    print(f"✅ Results written to {path}")
+
+def compare_to_baseline(results, baseline_path, tolerance):
+    """Print p50 changes against an earlier --json run; returns the names that regressed."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    regressions = []
+    print(f"\n{'benchmark':<28}{'baseline p50':>14}{'p50':>10}{'change':>10}")
+    for name, summary in results.items():
+        before = baseline.get(name, {}).get("p50_ms")
+        after = summary.get("p50_ms")
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  ❌"
+        print(f"{name:<28}{before:>14.2f}{after:>10.2f}{change:>+10.0%}{flag}")
+    return regressions
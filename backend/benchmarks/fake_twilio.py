@@ -0,0 +1,55 @@
+"""A local stand-in for Twilio's Calls and Messages endpoints.
+
+Run from backend/, e.g.:
+
+    python benchmarks/fake_twilio.py --port 8099 --latency-ms 300 --fail-rate 0.3
+
+then start the server with TWILIO_API_URL=http://127.0.0.1:8099 and post to
+/alerts. Each request waits --latency-ms and fails with a 503 at
+--fail-rate, so retries and backoff can be watched without sending real
+messages. GET /requests lists what was received.
+"""
+import argparse
+import asyncio
+import random
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+def create_app(latency_ms=0.0, fail_rate=0.0, seed=None):
+    app = FastAPI()
+    rng = random.Random(seed)
+    app.state.received = []
+
+    @app.post("/2010-04-01/Accounts/{account_sid}/{resource}.json")
+    async def create(account_sid: str, resource: str, request: Request):
+        form = dict(await request.form())
+        await asyncio.sleep(latency_ms / 1000.0)
+        if rng.random() < fail_rate:
+            app.state.received.append({"resource": resource, "failed": True, **form})
+            return JSONResponse({"code": 20503, "message": "Service unavailable", "status": 503}, status_code=503)
+        if resource not in ("Calls", "Messages"):
+            return JSONResponse({"code": 20404, "message": "Not found", "status": 404}, status_code=404)
+        app.state.received.append({"resource": resource, "failed": False, **form})
+        prefix = "CA" if resource == "Calls" else "SM"
+        return JSONResponse({"sid": prefix + uuid.uuid4().hex, "status": "queued"}, status_code=201)
+
+    @app.get("/requests")
+    async def requests():
+        return app.state.received
+
+    return app
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="time each request takes")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.fail_rate), host="127.0.0.1", port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Load generator for /ws/video.
+
+Start the server, then run from backend/, e.g.:
+
+    python benchmarks/loadgen.py --clients 8 --fps 5 --duration 30 \\
+        --frames ~/frames --languages en=0.6,hi=0.4
+
+Every client opens its own socket and replays the frames in a loop at
+--fps. A client keeps one frame in flight, like the app's capture loop
+waiting on the camera, so each response maps to the frame that caused it
+and the latency is the full send -> response time. Control messages the
+server sends in between, such as a session update, are skipped. When the
+server can't keep up, the achieved FPS drops below the target instead of
+frames being silently dropped. Frames over the session's rate limit, or
+past their deadline, are answered with status "dropped" and counted
+separately.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import sys
+import time
+from collections import Counter, defaultdict
+
+from websockets.asyncio.client import connect
+
+from common import compare_to_baseline, load_jpegs, summarize, write_json
+
+def parse_languages(spec):
+    """'en=0.6,hi=0.4' -> [('en', 0.6), ('hi', 0.4)]; a bare code counts as weight 1."""
+    languages = []
+    for item in spec.split(","):
+        if not item:
+            continue
+        lang, _, weight = item.partition("=")
+        languages.append((lang.strip(), float(weight) if weight else 1.0))
+    if not languages:
+        raise ValueError("no languages given")
+    return languages
+
+def assign_languages(languages, clients):
+    """Spread clients over languages in proportion to the weights, deterministically."""
+    total = sum(weight for _, weight in languages)
+    assigned = []
+    counts = Counter()
+    for i in range(clients):
+        # Pick the language furthest below its share so far
+        lang = max(languages, key=lambda item: item[1] / total * (i + 1) - counts[item[0]])[0]
+        counts[lang] += 1
+        assigned.append(lang)
+    return assigned
+
+class ClientStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = Counter()
+        self.responses = 0
+        # Frames the server answered with "dropped" (rate limit or deadline) instead of a result
+        self.dropped = 0
+        self.started = None
+        self.finished = None
+
+    @property
+    def fps(self):
+        if self.started is None or self.finished is None or self.finished <= self.started:
+            return 0.0
+        return self.responses / (self.finished - self.started)
+
+# Message types that answer a frame; anything else with a type (e.g. "session") is a control message
+RESULT_TYPES = (None, "keyframe", "delta")
+
+async def recv_result(ws, timeout):
+    """Next message that answers a frame, skipping control messages the server sends in between."""
+    deadline = time.perf_counter() + timeout
+    while True:
+        message = await asyncio.wait_for(ws.recv(), max(0.0, deadline - time.perf_counter()))
+        try:
+            response = json.loads(message)
+        except ValueError:
+            # Counted as a bad response by the caller
+            return None
+        if not isinstance(response, dict):
+            return None
+        if response.get("type") in RESULT_TYPES:
+            return response
+
+async def run_client(url, jpegs, fps, deadline, binary, timeout, offset, stats):
+    interval = 1.0 / fps if fps > 0 else 0.0
+    payloads = jpegs if binary else [base64.b64encode(jpeg).decode() for jpeg in jpegs]
+    try:
+        async with connect(url, max_size=None) as ws:
+            # The session message comes first, before any frame is sent
+            await asyncio.wait_for(ws.recv(), timeout)
+            stats.started = time.perf_counter()
+            index = offset
+            next_send = time.perf_counter()
+            while time.perf_counter() < deadline:
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+                next_send += interval
+                sent = time.perf_counter()
+                await ws.send(payloads[index % len(payloads)])
+                index += 1
+                try:
+                    response = await recv_result(ws, timeout)
+                except asyncio.TimeoutError:
+                    stats.errors["timeout"] += 1
+                    continue
+                latency = time.perf_counter() - sent
+                if response is None:
+                    stats.errors["bad_response"] += 1
+                    continue
+                if response.get("status") == "error":
+                    stats.errors["server_error"] += 1
+                    continue
+                if response.get("status") == "dropped":
+                    stats.dropped += 1
+                    continue
+                stats.responses += 1
+                stats.latencies.append(latency)
+                # A slow response pushes the schedule back instead of bursting to catch up
+                next_send = max(next_send, time.perf_counter())
+    except Exception as e:
+        stats.errors[type(e).__name__] += 1
+        print(f"❌ Client error: {str(e)}")
+    finally:
+        stats.finished = time.perf_counter()
+
+async def run(args):
+    jpegs = load_jpegs(args.frames, args.max_frames)
+    if not jpegs:
+        sys.exit(f"No frames found in {args.frames}")
+    languages = assign_languages(parse_languages(args.languages), args.clients)
+
+    stats = [ClientStats() for _ in range(args.clients)]
+    deadline = time.perf_counter() + args.ramp_up + args.duration
+    tasks = []
+    for i, (lang, client_stats) in enumerate(zip(languages, stats)):
+        url = f"{args.url}?target={lang}"
+        # Staggered connects, and each client starts at a different frame
+        delay = args.ramp_up * i / max(1, args.clients)
+        tasks.append(asyncio.create_task(
+            delayed(delay, run_client(url, jpegs, args.fps, deadline, args.binary,
+                                      args.timeout, i * 7, client_stats))
+        ))
+    await asyncio.gather(*tasks)
+    return languages, stats
+
+async def delayed(delay, coroutine):
+    await asyncio.sleep(delay)
+    await coroutine
+
+def summarize_clients(clients):
+    summary = summarize([latency for client in clients for latency in client.latencies])
+    # Each client is rated over its own connected time, so the ramp-up doesn't count
+    summary["per_second"] = sum(client.fps for client in clients)
+    return summary
+
+def report(args, languages, stats):
+    errors = sum((client.errors for client in stats), Counter())
+    overall = summarize_clients(stats)
+
+    by_language = defaultdict(list)
+    for lang, client in zip(languages, stats):
+        by_language[lang].append(client)
+
+    print(f"\n{'':<12}{'responses':>10}{'fps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    rows = [("all", overall)] + [(lang, summarize_clients(clients)) for lang, clients in sorted(by_language.items())]
+    for label, summary in rows:
+        if not summary["count"]:
+            print(f"{label:<12}{0:>10}")
+            continue
+        print(
+            f"{label:<12}{summary['count']:>10}{summary['per_second']:>9.1f}"
+            f"{summary['p50_ms']:>9.1f}{summary['p95_ms']:>9.1f}{summary['p99_ms']:>9.1f}"
+        )
+    target = args.clients * args.fps
+    print(f"\ntarget {target:.1f} fps from {args.clients} clients, achieved {overall.get('per_second', 0):.1f} fps")
+    print(f"errors: {dict(errors) if errors else 'none'}")
+    dropped = sum(client.dropped for client in stats)
+    print(f"dropped by the server: {dropped}")
+
+    results = {"loadgen": {**overall, "errors": sum(errors.values()), "dropped": dropped, "target_fps": target}}
+    results.update({f"loadgen.{label}": summary for label, summary in rows[1:]})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws/video")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--fps", type=float, default=5.0, help="target frames per second per client")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of steady load")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="seconds over which clients connect")
+    parser.add_argument("--frames", help="directory of JPEG frames (default: synthetic)")
+    parser.add_argument("--max-frames", type=int, default=200)
+    parser.add_argument("--languages", default="en", help="language mix, e.g. en=0.6,hi=0.3,es=0.1")
+    parser.add_argument("--binary", action="store_true", help="send raw JPEG bytes instead of base64 text")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for each response")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown vs the baseline")
+    args = parser.parse_args()
+
+    languages, stats = asyncio.run(run(args))
+    results = report(args, languages, stats)
+    if args.json:
+        write_json(args.json, results)
+    if args.baseline and compare_to_baseline(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""Gateway/inference-node split: the models on other processes or machines, behind one endpoint.
+
+An inference node owns YOLO and the depth model and nothing else: no
+sessions, no translation, no Twilio. The gateway is the usual app with
+INFERENCE_NODES set; it keeps the client sockets, sessions, tracking and
+translation, and sends each frame it needs inferred to a node as a JPEG
+over a plain TCP connection. Add capacity by starting another node and
+adding its address; clients keep talking to the gateway.
+
+Run from backend/, e.g. two nodes and a gateway on one machine:
+
+    python cluster.py node --port 7071
+    python cluster.py node --port 7072
+    INFERENCE_NODES=127.0.0.1:7071,127.0.0.1:7072 python run.py
+
+or all three at once with `python cluster.py local --nodes 2`.
+
+Wire format, both directions: a 4-byte header length and a 4-byte payload
+length (big-endian), a MessagePack header, then the payload.
+
+    node -> gateway  {"type": "hello", "names": {...}}         once, when the models are ready
+    gateway -> node  {"type": "infer", "id", "level", "detect"} + JPEG
+    node -> gateway  {"type": "result", "id", "objects", "shape", "error"} + float16 depth map
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import struct
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import msgpack
+import numpy as np
+
+import metrics
+from backends import YOLO_MODEL_PATH, load_yolo
+from batching import MicroBatcher
+from compute import THREAD_BUDGET, ComputeBudget
+from control import QUALITY_LEVELS
+from depth import detected_objects_from_results
+from metrics import InstrumentedExecutor
+from models import registry, warmup_frame
+from workers import WORKER_BATCH_SIZE, WORKER_BATCH_WINDOW_MS, WORKER_SLOTS
+
+# Comma-separated host:port of inference nodes; set, this server runs no models itself
+INFERENCE_NODES = [node.strip() for node in os.environ.get("INFERENCE_NODES", "").split(",") if node.strip()]
+NODE_PORT = int(os.environ.get("NODE_PORT", "7070"))
+# Frames sent to one node and not answered yet; more wait for a node with room
+NODE_MAX_OUTSTANDING = int(os.environ.get("NODE_MAX_OUTSTANDING", str(WORKER_SLOTS)))
+# A frame not answered in time is sent to another node
+NODE_TIMEOUT_SECONDS = float(os.environ.get("NODE_TIMEOUT_SECONDS", "5"))
+# Nodes a frame is tried on before it fails
+NODE_ATTEMPTS = int(os.environ.get("NODE_ATTEMPTS", "2"))
+NODE_RECONNECT_SECONDS = float(os.environ.get("NODE_RECONNECT_SECONDS", "1"))
+# The gateway's decoder already downscaled the frame, so this is usually smaller than the upload
+NODE_JPEG_QUALITY = int(os.environ.get("NODE_JPEG_QUALITY", "90"))
+
+LENGTHS = struct.Struct("!II")
+
+def encode_message(header, payload=b""):
+    packed = msgpack.packb(header)
+    return LENGTHS.pack(len(packed), len(payload)) + packed + payload
+
+async def read_message(reader):
+    """(header, payload) of the next message; IncompleteReadError when the peer is gone."""
+    header_length, payload_length = LENGTHS.unpack(await reader.readexactly(LENGTHS.size))
+    header = msgpack.unpackb(await reader.readexactly(header_length), strict_map_key=False)
+    payload = await reader.readexactly(payload_length) if payload_length else b""
+    return header, payload
+
+class NodeUnavailable(ConnectionError):
+    """The node went away or didn't answer; the frame can be tried elsewhere."""
+
+class InferenceNode:
+    """Stateless model server: YOLO and depth for any gateway that connects.
+
+    Frames from all connections go through the same two micro-batchers,
+    so a node batches across gateways the way the app batches across
+    sockets. Detection and depth each get their own share of the cores.
+    """
+
+    def __init__(self, model_path, batch_size=WORKER_BATCH_SIZE, window_ms=WORKER_BATCH_WINDOW_MS):
+        budget = ComputeBudget({"detection": 1, "depth": 1}) if THREAD_BUDGET else None
+        if budget is not None:
+            budget.apply()
+            metrics.register_compute_budget(budget)
+        self.detection_executor = InstrumentedExecutor(
+            max_workers=1, thread_name_prefix="node-detection",
+            initializer=budget.initializer("detection") if budget is not None else None
+        )
+        self.depth_executor = InstrumentedExecutor(
+            max_workers=1, thread_name_prefix="node-depth",
+            initializer=budget.initializer("depth") if budget is not None else None
+        )
+        self.decode_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="node-decode")
+
+        # Loaded in the threads that run them, so they pick up the stage's thread settings
+        self.model = self.detection_executor.submit(load_yolo, model_path).result()
+        self.detection_executor.submit(self.model, [warmup_frame()], verbose=False).result()
+        self.depth_engine = self.depth_executor.submit(registry.get, "depth").result()
+        self.names = {int(cls): name for cls, name in self.model.names.items()}
+        self.detection_batcher = MicroBatcher(
+            "NodeDetection", self._detect, self.detection_executor, max_batch=batch_size, window_ms=window_ms
+        )
+        self.depth_batcher = MicroBatcher(
+            "NodeDepth", self._depth, self.depth_executor, max_batch=batch_size, window_ms=window_ms
+        )
+
+    def _detect(self, items):
+        # One resolution per batch: the most degraded level any request asked for
+        level = QUALITY_LEVELS[max(level for _, level in items)]
+        results = self.model([frame for frame, _ in items], imgsz=level.yolo_imgsz, verbose=False)
+        return [detected_objects_from_results(result) for result in results]
+
+    def _depth(self, items):
+        level = QUALITY_LEVELS[max(level for _, level in items)]
+        return self.depth_engine.infer([frame for frame, _ in items], level.depth_input_size)
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        print(f"✅ Gateway connected: {peer}")
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def send(data):
+            async with write_lock:
+                writer.write(data)
+                await writer.drain()
+
+        try:
+            await send(encode_message({"type": "hello", "names": self.names}))
+            while True:
+                header, payload = await read_message(reader)
+                if header.get("type") != "infer":
+                    continue
+                task = asyncio.create_task(self._infer(header, payload, send))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+            print(f"🔒 Gateway disconnected: {peer}")
+
+    async def _infer(self, header, payload, send):
+        level, detect = header.get("level", 0), header.get("detect", True)
+        try:
+            frame = await asyncio.get_running_loop().run_in_executor(
+                self.decode_executor, cv2.imdecode, np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR
+            )
+            if frame is None:
+                raise ValueError("invalid JPEG")
+            jobs = [self.depth_batcher.submit((frame, level))]
+            if detect:
+                jobs.append(self.detection_batcher.submit((frame, level)))
+            depth_map, *detections = await asyncio.gather(*jobs)
+            objects = detections[0] if detect else None
+            response = {"type": "result", "id": header["id"], "objects": objects,
+                        "shape": list(depth_map.shape), "error": None}
+            data = encode_message(response, depth_map.astype(np.float16).tobytes())
+        except Exception as e:
+            print(f"❌ Node inference error: {str(e)}")
+            data = encode_message({"type": "result", "id": header["id"], "objects": None, "shape": None, "error": str(e)})
+        try:
+            await send(data)
+        except ConnectionError:
+            pass
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"✅ Inference node listening on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+class NodeConnection:
+    """Gateway side of one inference node."""
+
+    def __init__(self, address):
+        self.address = address
+        host, _, port = address.rpartition(":")
+        self.host = host or "127.0.0.1"
+        self.port = int(port) if port else NODE_PORT
+        self.writer = None
+        self.pending = {}
+        self.ready = False
+        self.write_lock = asyncio.Lock()
+        metrics.node_outstanding.labels(address).set_function(lambda: len(self.pending))
+
+class NodePool:
+    """Hands frames to inference nodes over TCP; same interface as workers.WorkerPool.
+
+    Each frame goes to the ready node with the fewest unanswered frames.
+    When a node drops its connection or doesn't answer in time, its
+    unanswered frames are sent to another node, and the gateway keeps
+    reconnecting to it in the background.
+    """
+
+    def __init__(self, addresses, max_outstanding=NODE_MAX_OUTSTANDING, timeout=NODE_TIMEOUT_SECONDS,
+                 attempts=NODE_ATTEMPTS, jpeg_quality=NODE_JPEG_QUALITY):
+        self.nodes = [NodeConnection(address) for address in addresses]
+        self.max_outstanding = max_outstanding
+        self.timeout = timeout
+        self.attempts = max(1, attempts)
+        self.jpeg_quality = jpeg_quality
+        self.names = None
+        self._ids = itertools.count()
+        self._tasks = []
+        self._ready = None
+        self._capacity = None
+
+    def start(self):
+        self._ready = asyncio.Event()
+        self._capacity = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._connect(node)) for node in self.nodes]
+        print(f"🔄 Connecting to {len(self.nodes)} inference nodes")
+
+    async def wait_ready(self):
+        await self._ready.wait()
+
+    async def _connect(self, node):
+        """Keeps one node connected, reading its results; reconnects after a failure."""
+        while True:
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(node.host, node.port), self.timeout
+                )
+                try:
+                    # The hello comes once the node's models are loaded, which can take a while
+                    hello, _ = await read_message(reader)
+                    node.writer = writer
+                    node.ready = True
+                    self.names = {int(cls): name for cls, name in hello["names"].items()}
+                    self._ready.set()
+                    await self._notify_capacity()
+                    print(f"✅ Inference node ready: {node.address}")
+                    while True:
+                        header, payload = await read_message(reader)
+                        self._complete(node, header, payload)
+                finally:
+                    writer.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if node.ready:
+                    print(f"❌ Inference node lost: {node.address} - {str(e) or type(e).__name__}")
+            self._node_down(node)
+            await asyncio.sleep(NODE_RECONNECT_SECONDS)
+
+    def _complete(self, node, header, payload):
+        future = node.pending.pop(header["id"], None)
+        asyncio.ensure_future(self._notify_capacity())
+        if future is None or future.done():
+            # Answered after the frame timed out and was sent elsewhere
+            return
+        if header["error"] is not None:
+            future.set_exception(RuntimeError(header["error"]))
+            return
+        depth_map = np.frombuffer(payload, dtype=np.float16).reshape(header["shape"]).astype(np.float32)
+        future.set_result((header["objects"], depth_map))
+
+    def _node_down(self, node):
+        node.ready = False
+        node.writer = None
+        for future in node.pending.values():
+            if not future.done():
+                future.set_exception(NodeUnavailable(f"inference node {node.address} disconnected"))
+        node.pending.clear()
+
+    async def _notify_capacity(self):
+        async with self._capacity:
+            self._capacity.notify_all()
+
+    def status(self):
+        return {node.address: "ready" if node.ready else "connecting" for node in self.nodes}
+
+    def _pick_node(self, tried):
+        candidates = [node for node in self.nodes if node.ready and len(node.pending) < self.max_outstanding]
+        # A node that already failed this frame only if there is no other
+        untried = [node for node in candidates if node.address not in tried]
+        candidates = untried or candidates
+        if not candidates:
+            return None
+        return min(candidates, key=lambda node: len(node.pending))
+
+    async def _acquire(self, tried):
+        async with self._capacity:
+            node = self._pick_node(tried)
+            while node is None:
+                await self._capacity.wait()
+                node = self._pick_node(tried)
+            return node
+
+    async def _send(self, node, frame_jpeg, level, detect):
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        node.pending[request_id] = future
+        try:
+            async with node.write_lock:
+                if node.writer is None:
+                    raise NodeUnavailable(f"inference node {node.address} disconnected")
+                node.writer.write(encode_message(
+                    {"type": "infer", "id": request_id, "level": level, "detect": detect}, frame_jpeg
+                ))
+                await node.writer.drain()
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise NodeUnavailable(f"inference node {node.address} timed out")
+        except NodeUnavailable:
+            raise
+        except ConnectionError as e:
+            raise NodeUnavailable(f"inference node {node.address}: {str(e)}")
+        finally:
+            if node.pending.pop(request_id, None) is not None:
+                asyncio.ensure_future(self._notify_capacity())
+
+    async def submit(self, frame, level=0, detect=True):
+        """Run detection and depth for one frame; returns (detected_objects, depth_map).
+
+        `level` indexes control.QUALITY_LEVELS and sets the model resolution.
+        With `detect=False` only depth runs and detected_objects is None.
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.wait_for(self.wait_ready(), self.timeout)
+        ok, encoded = await loop.run_in_executor(
+            None, cv2.imencode, ".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        )
+        if not ok:
+            raise RuntimeError("frame could not be encoded")
+        frame_jpeg = encoded.tobytes()
+
+        tried = set()
+        for attempt in range(self.attempts):
+            node = await asyncio.wait_for(self._acquire(tried), self.timeout)
+            try:
+                return await self._send(node, frame_jpeg, level, detect)
+            except NodeUnavailable as e:
+                tried.add(node.address)
+                if attempt + 1 < self.attempts:
+                    metrics.node_failovers.inc()
+                    print(f"⚠️ {str(e)}, retrying on another node")
+                else:
+                    raise
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        for node in self.nodes:
+            if node.writer is not None:
+                node.writer.close()
+            node.ready = False
+
+def run_node(args):
+    # Same model as the app would load; depth comes from the registry
+    node = InferenceNode(YOLO_MODEL_PATH, args.batch_size, args.window_ms)
+    if args.metrics_port:
+        from prometheus_client import start_http_server
+        # Batch sizes, queue depths and per-stage CPU of this node
+        start_http_server(args.metrics_port)
+    try:
+        asyncio.run(node.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+def run_local(args):
+    """N nodes and a gateway as separate processes, for trying the split on one machine."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    ports = [args.node_port + i for i in range(args.nodes)]
+    processes = [
+        subprocess.Popen([sys.executable, os.path.join(here, "cluster.py"), "node", "--port", str(port)], cwd=here)
+        for port in ports
+    ]
+    env = dict(os.environ, INFERENCE_NODES=",".join(f"127.0.0.1:{port}" for port in ports))
+    processes.append(subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", args.host, "--port", str(args.port)], cwd=here, env=env
+    ))
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    node = commands.add_parser("node", help="run an inference node")
+    node.add_argument("--host", default="0.0.0.0")
+    node.add_argument("--port", type=int, default=NODE_PORT)
+    node.add_argument("--batch-size", type=int, default=WORKER_BATCH_SIZE)
+    node.add_argument("--window-ms", type=float, default=WORKER_BATCH_WINDOW_MS)
+    node.add_argument("--metrics-port", type=int, default=0, help="serve Prometheus metrics on this port (0: off)")
+    local = commands.add_parser("local", help="run nodes and a gateway on this machine")
+    local.add_argument("--nodes", type=int, default=2)
+    local.add_argument("--node-port", type=int, default=NODE_PORT)
+    local.add_argument("--host", default="0.0.0.0")
+    local.add_argument("--port", type=int, default=8000, help="gateway port for the app's clients")
+    args = parser.parse_args()
+
+    if args.command == "node":
+        run_node(args)
+    else:
+        run_local(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import os
+from dataclasses import dataclass
+from typing import Dict, List
+
+import cv2
+
+# 0 leaves torch, OpenCV and BLAS at their defaults: every call fans out over all cores
+THREAD_BUDGET = os.environ.get("THREAD_BUDGET", "1").lower() in ("1", "true", "yes")
+# Cores the server may use; 0 means every core this process is allowed on
+CPU_BUDGET = int(os.environ.get("CPU_BUDGET", "0"))
+# Shares of the budget for the model stages; the rest runs the event loop, decode and translation
+DETECTION_CPU_SHARE = float(os.environ.get("DETECTION_CPU_SHARE", "0.35"))
+DEPTH_CPU_SHARE = float(os.environ.get("DEPTH_CPU_SHARE", "0.5"))
+# 1: pin each stage's threads to its own cores (Linux only)
+CPU_AFFINITY = os.environ.get("CPU_AFFINITY", "1").lower() in ("1", "true", "yes")
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+@dataclass
+class StageBudget:
+    cores: List[int]
+    # Executor threads running the stage; they split its cores between them
+    workers: int
+
+    @property
+    def threads(self):
+        """Intra-op threads for each of the stage's executor threads.
+
+        Rounded up: the threads are rarely all in a model call at once.
+        """
+        return max(1, -(-len(self.cores) // self.workers))
+
+class ComputeBudget:
+    """Splits a core budget between detection, depth and everything else.
+
+    Each model stage gets its own cores and its executor threads are pinned
+    to them. torch's intra-op thread count is process-wide, not per thread,
+    so it can't differ between stages: it is set once to the largest
+    stage's per-thread share, and the pinning is what keeps a smaller stage
+    off the other stage's cores. Without this, every torch call starts a
+    pool across all cores and concurrent batches fight over them. With
+    fewer cores than stages, the stages share cores.
+    """
+
+    def __init__(self, workers: Dict[str, int], total=CPU_BUDGET, shares=None, affinity=CPU_AFFINITY):
+        cores = available_cores()
+        if total > 0:
+            cores = cores[:total]
+        if shares is None:
+            shares = {"detection": DETECTION_CPU_SHARE, "depth": DEPTH_CPU_SHARE}
+
+        self.stages = {}
+        start = 0
+        for stage, share in shares.items():
+            count = max(1, round(len(cores) * share))
+            self.stages[stage] = StageBudget(
+                [cores[(start + i) % len(cores)] for i in range(count)],
+                workers.get(stage, 1)
+            )
+            start += count
+        self.stages["other"] = StageBudget(cores[start:] or cores[-1:], 1)
+        self.affinity = affinity and hasattr(os, "sched_setaffinity")
+        # One value for the whole process; see the class docstring
+        self.torch_threads = max(budget.threads for stage, budget in self.stages.items() if stage != "other")
+        self._cpu_times = {}
+
+    def apply(self):
+        """Process-wide limits for the work outside the model stages: OpenCV and numpy's BLAS."""
+        threads = len(self.stages["other"].cores)
+        cv2.setNumThreads(threads)
+        try:
+            from threadpoolctl import threadpool_limits
+            # Only OpenBLAS (numpy's); torch's MKL follows torch.set_num_threads
+            threadpool_limits(limits={"openblas": threads})
+        except ImportError:
+            pass
+        summary = ", ".join(f"{stage} {len(budget.cores)}" for stage, budget in self.stages.items())
+        print(f"✅ CPU budget: {summary} cores{' (pinned)' if self.affinity else ''}")
+
+    def initializer(self, stage):
+        """ThreadPoolExecutor initializer that confines a thread to `stage`'s share."""
+        budget = self.stages[stage]
+
+        def init():
+            if self.affinity:
+                # Threads torch starts from here on inherit the mask
+                os.sched_setaffinity(0, budget.cores)
+            if stage != "other":
+                # Every backend needs torch: ultralytics runs on it. The same value from
+                # every stage, so the order the initializers run in doesn't matter.
+                import torch
+                torch.set_num_threads(self.torch_threads)
+
+        return init
+
+    def utilization(self, stage):
+        """Busy share of the stage's cores since the previous call for that stage."""
+        import psutil
+
+        per_cpu = psutil.cpu_times(percpu=True)
+        busy = total = 0.0
+        for core in self.stages[stage].cores:
+            times = per_cpu[core]
+            core_total = sum(times)
+            total += core_total
+            busy += core_total - times.idle - getattr(times, "iowait", 0.0)
+        previous = self._cpu_times.get(stage)
+        self._cpu_times[stage] = (busy, total)
+        if previous is None or total <= previous[1]:
+            return 0.0
+        return (busy - previous[0]) / (total - previous[1])
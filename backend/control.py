@@ -0,0 +1,110 @@
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Tuple
+
+# 0 turns the control channel off: fixed capture settings, full model resolution
+ADAPTIVE_CONTROL = os.environ.get("ADAPTIVE_CONTROL", "1").lower() in ("1", "true", "yes")
+# Per-session frame processing time the controller steers towards
+TARGET_LATENCY_MS = float(os.environ.get("TARGET_LATENCY_MS", "400"))
+# Degrade fast, recover slowly, so a spike doesn't make the settings oscillate
+STEP_DOWN_SECONDS = float(os.environ.get("CONTROL_STEP_DOWN_SECONDS", "1.0"))
+STEP_UP_SECONDS = float(os.environ.get("CONTROL_STEP_UP_SECONDS", "5.0"))
+# Pressure (latency / target, or load) under which quality is raised again
+RECOVER_PRESSURE = 0.6
+LATENCY_SMOOTHING = 0.3
+
+@dataclass(frozen=True)
+class QualityLevel:
+    interval_ms: int
+    jpeg_quality: float
+    max_width: int
+    yolo_imgsz: int
+    # Multiples of 14, the depth model's patch size
+    depth_input_size: Tuple[int, int]
+
+# Best first. Level 0 is what the app did before the control channel existed.
+QUALITY_LEVELS = (
+    QualityLevel(200, 0.5, 640, 640, (518, 392)),
+    QualityLevel(300, 0.45, 640, 512, (448, 336)),
+    QualityLevel(500, 0.4, 480, 416, (364, 280)),
+    QualityLevel(800, 0.35, 384, 320, (308, 224)),
+    QualityLevel(1200, 0.3, 320, 320, (252, 196)),
+)
+
+class Stepper:
+    """A quality level that moves one step at a time with asymmetric cooldowns."""
+
+    def __init__(self, step_down_seconds=STEP_DOWN_SECONDS, step_up_seconds=STEP_UP_SECONDS):
+        self.level = 0
+        self.step_down_seconds = step_down_seconds
+        self.step_up_seconds = step_up_seconds
+        self.changed_at = time.monotonic()
+
+    def update(self, pressure, now=None):
+        now = time.monotonic() if now is None else now
+        since = now - self.changed_at
+        if pressure > 1.0 and self.level < len(QUALITY_LEVELS) - 1 and since >= self.step_down_seconds:
+            self.level += 1
+            self.changed_at = now
+        elif pressure < RECOVER_PRESSURE and self.level > 0 and since >= self.step_up_seconds:
+            self.level -= 1
+            self.changed_at = now
+        return self.level
+
+class InferenceLoad:
+    """Frames currently inside the models, relative to what one round of batches holds.
+
+    Above 1.0 frames are queuing behind full batches. The model level
+    follows it, and every batch runs at the resolution of that level.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(1, capacity)
+        self.in_flight = 0
+        self.stepper = Stepper(step_down_seconds=2 * STEP_DOWN_SECONDS, step_up_seconds=2 * STEP_UP_SECONDS)
+
+    @property
+    def load(self):
+        return self.in_flight / self.capacity
+
+    @contextmanager
+    def track(self):
+        self.in_flight += 1
+        if ADAPTIVE_CONTROL:
+            self.stepper.update(self.load)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    @property
+    def model_level(self) -> QualityLevel:
+        return QUALITY_LEVELS[self.stepper.level]
+
+class SessionControl:
+    """Capture settings for one client, from its own latency and the global load."""
+
+    def __init__(self, target_latency_ms=TARGET_LATENCY_MS):
+        self.target_latency = target_latency_ms / 1000.0
+        self.latency = None
+        self.stepper = Stepper()
+        # Floor under interval_ms, from the session's frame rate limit
+        self.min_interval_ms = 0
+
+    def update(self, latency, load):
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+        self.stepper.update(max(self.latency / self.target_latency, load))
+        return self.message()
+
+    def message(self):
+        level = QUALITY_LEVELS[self.stepper.level]
+        settings = asdict(level)
+        # Model sizes are the server's business
+        del settings["yolo_imgsz"], settings["depth_input_size"]
+        settings["interval_ms"] = max(settings["interval_ms"], self.min_interval_ms)
+        return {"level": self.stepper.level, **settings}
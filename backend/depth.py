@@ -1,9 +1,9 @@
 from collections import deque
+import os
 import numpy as np
-import torch
-from PIL import Image
 import cv2
-from transformers import pipeline
+from backends import INFERENCE_BACKEND, INFERENCE_INT8, load_depth_runner
+from models import registry, warmup_frame
 
 # Known object widths in centimeters
 KNOWN_WIDTHS = {
@@ -22,72 +22,288 @@ KNOWN_WIDTHS = {
 FOCAL_LENGTH = 800  # approximate focal length in pixels
 SENSOR_WIDTH = 640  # image width in pixels
 
-# Initialize model and buffers
-pipe = pipeline(
-    task="depth-estimation", 
-    model="depth-anything/Depth-Anything-V2-Small-hf",
-    device="cuda" if torch.cuda.is_available() else "cpu"
+DEPTH_MODEL_PATH = os.environ.get("DEPTH_MODEL_PATH", "depth-anything/Depth-Anything-V2-Small-hf")
+# Model input (width, height): 4:3 like the camera, multiples of the ViT patch size (14)
+DEPTH_INPUT_SIZE = (518, 392)
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+# Percentiles that bound the normalized depth range, read from every Nth row and column
+DEPTH_PERCENTILES = (5, 95)
+PERCENTILE_SAMPLE_STEP = 2
+# Obstacle grid (/ws/video?grid=1): columns x rows of cells, each reporting its nearest distance
+OBSTACLE_GRID_COLS = int(os.environ.get("OBSTACLE_GRID_COLS", "8"))
+OBSTACLE_GRID_ROWS = int(os.environ.get("OBSTACLE_GRID_ROWS", "6"))
+# Weight of the newest frame in each cell's smoothed distance
+OBSTACLE_GRID_SMOOTHING = float(os.environ.get("OBSTACLE_GRID_SMOOTHING", "0.5"))
+# Percentile of a cell's values taken as its nearest point: low, but above single-pixel noise
+OBSTACLE_GRID_PERCENTILE = 10
+
+class DepthEngine:
+    """Batched Depth-Anything inference on raw BGR frames.
+
+    Frames are resized straight into one preallocated uint8 batch, then
+    channel-swapped and normalized as a single array op, so there is no
+    PIL round-trip and no per-image pipeline overhead. With the onnx or
+    openvino backend the exported model runs instead of eager PyTorch.
+    """
+
+    def __init__(self, model_path=DEPTH_MODEL_PATH, input_size=DEPTH_INPUT_SIZE, device=None,
+                 backend=INFERENCE_BACKEND, int8=INFERENCE_INT8):
+        self.backend = backend
+        self.input_size = input_size
+        if backend == "torch":
+            import torch
+            from transformers import AutoModelForDepthEstimation
+
+            self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+            self.model = AutoModelForDepthEstimation.from_pretrained(model_path).to(self.device).eval()
+            # Normalization constants pre-scaled to 0..255 so uint8 pixels are used as-is
+            self.mean = torch.tensor(IMAGENET_MEAN, device=self.device).view(1, 3, 1, 1) * 255
+            self.std = torch.tensor(IMAGENET_STD, device=self.device).view(1, 3, 1, 1) * 255
+            self.runner = None
+        else:
+            # Exported graphs have a fixed input size; per-call sizes are torch-only
+            self.device = "cpu"
+            self.runner = load_depth_runner(model_path, input_size, backend, int8)
+            self.mean = np.array(IMAGENET_MEAN, dtype=np.float32).reshape(1, 3, 1, 1) * 255
+            self.std = np.array(IMAGENET_STD, dtype=np.float32).reshape(1, 3, 1, 1) * 255
+
+    def resize_batch(self, frames, input_size=None):
+        width, height = self.input_size if input_size is None or self.runner is not None else input_size
+        batch = np.empty((len(frames), height, width, 3), dtype=np.uint8)
+        for i, frame in enumerate(frames):
+            cv2.resize(frame, (width, height), dst=batch[i], interpolation=cv2.INTER_AREA)
+        return batch
+
+    def preprocess(self, frames, input_size=None):
+        batch = self.resize_batch(frames, input_size)
+        if self.runner is not None:
+            # NHWC BGR -> NCHW RGB, one contiguous float32 copy
+            pixels = batch[..., ::-1].transpose(0, 3, 1, 2).astype(np.float32, order="C")
+            pixels -= self.mean
+            pixels /= self.std
+            return pixels
+        import torch
+        pixels = torch.from_numpy(batch).to(self.device)
+        # NHWC BGR -> NCHW RGB
+        pixels = pixels.permute(0, 3, 1, 2).flip(1).float()
+        return (pixels - self.mean) / self.std
+
+    def infer(self, frames, input_size=None):
+        """Return one float32 depth map (model output resolution) per frame.
+
+        `input_size` (width, height) runs this batch at a lower resolution
+        when the server is overloaded.
+        """
+        if not frames:
+            return []
+        if self.runner is not None:
+            depth_maps = self.runner(self.preprocess(frames, input_size))
+            return list(depth_maps.astype(np.float32, copy=False))
+        import torch
+        with torch.inference_mode():
+            pixel_values = self.preprocess(frames, input_size)
+            predicted_depth = self.model(pixel_values=pixel_values).predicted_depth
+            depth_maps = predicted_depth.float().cpu().numpy()
+        return list(depth_maps)
+
+registry.register(
+    "depth",
+    DepthEngine,
+    warmup=lambda engine: engine.infer([warmup_frame()])
 )
 distance_buffer = deque(maxlen=8)
 
-def calculate_depth_from_width(pixel_width, real_width):
-    """Calculate depth using real-world object width."""
-    if pixel_width == 0:
-        return None
-    return (real_width * FOCAL_LENGTH) / pixel_width
+def normalized_to_distance(value):
+    """Convert normalized depth (0-255) to centimeters; works on scalars and arrays."""
+    return np.where(
+        value < 128,
+        30 + (value * 70 / 128),
+        100 + ((value - 128) * 400 / 127)
+    )
+
+def box_means(integral, boxes):
+    """Mean value inside each xyxy box, read from an integral image in one pass."""
+    h, w = integral.shape[0] - 1, integral.shape[1] - 1
+    x1 = np.clip(np.floor(boxes[:, 0]), 0, w - 1).astype(np.intp)
+    y1 = np.clip(np.floor(boxes[:, 1]), 0, h - 1).astype(np.intp)
+    x2 = np.clip(np.ceil(boxes[:, 2]), x1 + 1, w).astype(np.intp)
+    y2 = np.clip(np.ceil(boxes[:, 3]), y1 + 1, h).astype(np.intp)
+    sums = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+    return sums / ((x2 - x1) * (y2 - y1))
+
+class DepthSummary:
+    """Normalized (0-255) region means of a depth map without building the normalized map.
+
+    The smoothed map is clipped to its 5th/95th percentiles once, in float32
+    at the model's output resolution, and summed into an integral image.
+    Since the normalization is affine on the clipped values, the mean of any
+    box is read from the integral image and normalized afterwards.
+    """
+
+    def __init__(self, depth_map, sample_step=PERCENTILE_SAMPLE_STEP):
+        self.shape = depth_map.shape
+        depth_map = cv2.GaussianBlur(depth_map, (5, 5), 0)
+        # Both percentiles from one partition of a strided sample
+        sample = depth_map[::sample_step, ::sample_step].ravel()
+        ranks = [round(p / 100 * (sample.size - 1)) for p in DEPTH_PERCENTILES]
+        low, high = np.partition(sample, ranks)[ranks]
+        self.low = float(low)
+        self.scale = 255.0 / (high - low) if high > low else 0.0
+        self.clipped = np.clip(depth_map, low, high, out=depth_map)
+        self.integral = cv2.integral(self.clipped, sdepth=cv2.CV_64F)
+
+    def box_means(self, boxes):
+        """Normalized mean inside each xyxy box (map pixels)."""
+        return (box_means(self.integral, boxes) - self.low) * self.scale
+
+    def cell_lows(self, cols, rows, percentile=OBSTACLE_GRID_PERCENTILE):
+        """Normalized low percentile of each cell of a cols x rows grid, as a (rows, cols) array.
+
+        One reshape into blocks and one partition over all of them; the
+        remainder rows and columns that don't fill a cell are left out.
+        """
+        clipped = self.clipped
+        h, w = self.shape
+        if h < rows or w < cols:
+            # Map smaller than the grid: repeat pixels so every cell gets at least one
+            clipped = cv2.resize(clipped, (max(w, cols), max(h, rows)), interpolation=cv2.INTER_NEAREST)
+            h, w = clipped.shape
+        cell_h, cell_w = h // rows, w // cols
+        blocks = clipped[:cell_h * rows, :cell_w * cols].reshape(rows, cell_h, cols, cell_w)
+        blocks = blocks.transpose(0, 2, 1, 3).reshape(rows, cols, cell_h * cell_w)
+        k = round(percentile / 100 * (cell_h * cell_w - 1))
+        return (np.partition(blocks, k, axis=2)[:, :, k] - self.low) * self.scale
+
+class ObstacleGrid:
+    """One session's coarse obstacle map: the nearest distance (cm) in each grid cell.
+
+    Read from the DepthSummary the frame already has, so it costs one block
+    reduction and no model call. Cells are smoothed across frames with an
+    exponential moving average, like the scene distance is with its buffer.
+    """
+
+    def __init__(self, cols=OBSTACLE_GRID_COLS, rows=OBSTACLE_GRID_ROWS, smoothing=OBSTACLE_GRID_SMOOTHING):
+        self.cols = cols
+        self.rows = rows
+        self.smoothing = smoothing
+        self.distances = None
+
+    def update(self, summary):
+        """Smoothed distances as rows (top first) of ints, left to right."""
+        distances = normalized_to_distance(summary.cell_lows(self.cols, self.rows))
+        if self.distances is None:
+            self.distances = distances
+        else:
+            self.distances += self.smoothing * (distances - self.distances)
+        return np.rint(self.distances).astype(int).tolist()
+
+def fuse_object_distances(summary, detected_objects, frame_size):
+    """Per-object distances from one depth map, fused with the known-width estimate.
+
+    `summary` is the map's DepthSummary; `detected_objects` holds dicts with
+    'class', 'confidence' and an xyxy 'box' in frame pixels; `frame_size`
+    is the frame's (width, height). Returns the per-object list (nearest
+    first) and the width-based distances that were available.
+    """
+    frame_w, frame_h = frame_size
+    h, w = summary.shape
+    boxes = np.array([obj['box'] for obj in detected_objects], dtype=np.float64)
+    boxes *= (w / frame_w, h / frame_h, w / frame_w, h / frame_h)
+
+    # Central half of each box, so background at the edges doesn't leak in
+    centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+    half_sizes = (boxes[:, 2:] - boxes[:, :2]) / 4
+    inner_boxes = np.concatenate([centers - half_sizes, centers + half_sizes], axis=1)
+
+    ai_distances = normalized_to_distance(summary.box_means(inner_boxes))
+
+    # Width-based estimate for classes of known size (pixel widths at SENSOR_WIDTH)
+    pixel_widths = (boxes[:, 2] - boxes[:, 0]) * (SENSOR_WIDTH / w)
+    real_widths = np.array([KNOWN_WIDTHS.get(obj['class'], 0) for obj in detected_objects], dtype=np.float64)
+    known = (real_widths > 0) & (pixel_widths > 0)
+    width_distances = real_widths * FOCAL_LENGTH / np.maximum(pixel_widths, 1e-6)
+    distances = np.where(known, 0.4 * ai_distances + 0.6 * width_distances, ai_distances)
+
+    objects = [
+        {
+            "class": obj['class'],
+            "confidence": round(float(obj.get('confidence', 0)), 2),
+            "distance": round(float(distance), 1),
+            "method": "hybrid" if is_known else "ai",
+            # Present with TRACKING=1
+            **({"track_id": obj['track_id']} if 'track_id' in obj else {})
+        }
+        for obj, distance, is_known in zip(detected_objects, distances, known)
+    ]
+    objects.sort(key=lambda obj: obj["distance"])
+    return objects, width_distances[known].tolist()
+
+def detected_objects_from_results(results):
+    """YOLO boxes as the dicts fuse_object_distances expects."""
+    boxes = results.boxes
+    if boxes is None or len(boxes) == 0:
+        return []
+    xyxy = boxes.xyxy.cpu().numpy()
+    classes = boxes.cls.cpu().numpy().astype(int)
+    confidences = boxes.conf.cpu().numpy()
+    return [
+        {"class": results.names[cls], "confidence": float(conf), "box": box.tolist()}
+        for box, cls, conf in zip(xyxy, classes, confidences)
+    ]
 
 def get_depth(frame, detected_objects=None):
     if frame is None:
         return None
 
     try:
-        # Resize frame for consistent results
-        frame = cv2.resize(frame, (640, 480))
-        
-        # Get AI-based depth estimation
-        pil_image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        depth_result = pipe(pil_image)
-        depth_map = depth_result['predicted_depth'].detach().cpu().numpy()
-        
-        # Apply refinements
-        depth_map = cv2.GaussianBlur(depth_map, (5, 5), 0)
-        depth_min = np.percentile(depth_map, 5)
-        depth_max = np.percentile(depth_map, 95)
-        normalized_depth = np.clip(
-            ((depth_map - depth_min) * 255 / (depth_max - depth_min)),
-            0, 255
-        )
-        
-        # Region-based estimation
-        h, w = normalized_depth.shape
-        center_region = normalized_depth[h//3:2*h//3, w//3:2*w//3]
-        lower_region = normalized_depth[2*h//3:, w//3:2*w//3]
-        upper_region = normalized_depth[:h//3, w//3:2*w//3]
-        
+        depth_map = registry.get("depth").infer([frame])[0]
+    except Exception as e:
+        print(f"Depth estimation error: {str(e)}")
+        return {"depth": None, "error": str(e)}
+    frame_size = (frame.shape[1], frame.shape[0])
+    return depth_from_map(depth_map, detected_objects, frame_size)
+
+def depth_from_map(depth_map, detected_objects=None, frame_size=None, buffer=None, grid=None):
+    """Turn a depth map from DepthEngine.infer into a distance estimate.
+
+    With `detected_objects` (see fuse_object_distances) the response also
+    carries a per-object distance list. `buffer` is the temporal smoothing
+    window; pass one per session so clients don't smooth each other. With
+    a session's ObstacleGrid the response also carries "grid".
+    """
+    if depth_map is None:
+        return None
+    if buffer is None:
+        buffer = distance_buffer
+
+    try:
+        summary = DepthSummary(depth_map)
+
+        # Region-based estimation: center, lower and upper thirds of the middle column
+        h, w = summary.shape
+        regions = np.array([
+            [w // 3, h // 3, 2 * w // 3, 2 * h // 3],
+            [w // 3, 2 * h // 3, 2 * w // 3, h],
+            [w // 3, 0, 2 * w // 3, h // 3],
+        ], dtype=np.float64)
+        center, lower, upper = summary.box_means(regions)
+
         # Calculate AI-based depth
-        ai_depth = (
-            0.5 * np.mean(center_region) +
-            0.3 * np.mean(lower_region) +
-            0.2 * np.mean(upper_region)
-        )
-        
+        ai_depth = 0.5 * center + 0.3 * lower + 0.2 * upper
+
         # Convert to real-world distance
-        ai_distance = (
-            30 + (ai_depth * 70 / 128) if ai_depth < 128
-            else 100 + ((ai_depth - 128) * 400 / 127)
-        )
+        ai_distance = float(normalized_to_distance(ai_depth))
 
-        # Calculate object-based depth if objects detected
+        # Per-object distances from the same depth map if objects detected
+        objects = []
         object_distances = []
         if detected_objects and isinstance(detected_objects, list):
-            for obj in detected_objects:
-                if obj.get('class') in KNOWN_WIDTHS:
-                    obj_width = obj.get('width', 0)  # pixel width
-                    if obj_width > 0:
-                        real_width = KNOWN_WIDTHS[obj['class']]
-                        obj_distance = calculate_depth_from_width(obj_width, real_width)
-                        if obj_distance:
-                            object_distances.append(obj_distance)
+            if frame_size is None:
+                frame_size = (w, h)
+            objects, object_distances = fuse_object_distances(
+                summary, detected_objects, frame_size
+            )
 
         # Combine AI and object-based depths
         final_distance = ai_distance
@@ -97,31 +313,30 @@ def get_depth(frame, detected_objects=None):
             final_distance = (0.4 * ai_distance + 0.6 * obj_distance_avg)
 
         # Temporal smoothing with outlier rejection
-        if len(distance_buffer) > 0:
-            mean_dist = sum(distance_buffer) / len(distance_buffer)
+        if len(buffer) > 0:
+            mean_dist = sum(buffer) / len(buffer)
             if abs(final_distance - mean_dist) <= mean_dist * 0.4:
-                distance_buffer.append(final_distance)
+                buffer.append(final_distance)
         else:
-            distance_buffer.append(final_distance)
+            buffer.append(final_distance)
 
         # Calculate final smoothed distance
-        smoothed_distance = sum(distance_buffer) / len(distance_buffer)
+        smoothed_distance = sum(buffer) / len(buffer)
         rounded_distance = round(smoothed_distance, 1)
 
         # Prepare response with additional info
         response = {
-            "depth": rounded_distance,
-            "confidence": min(len(distance_buffer) / 8.0, 1.0),
+            "depth": float(rounded_distance),
+            "confidence": min(len(buffer) / 8.0, 1.0),
             "unit": "cm",
-            "method": "hybrid" if object_distances else "ai"
+            "method": "hybrid" if object_distances else "ai",
+            "objects": objects
         }
+        if grid is not None:
+            response["grid"] = grid.update(summary)
 
         return response
 
     except Exception as e:
         print(f"Depth estimation error: {str(e)}")
-        return {"depth": None, "error": str(e)}
-
-    finally:
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
\ No newline at end of file
+        return {"depth": None, "error": str(e)}
\ No newline at end of file
@@ -1,100 +1,133 @@
+import os
+import time
+from threading import Lock
+
 import cv2
-import mediapipe as mp
-mp_drawing = mp.solutions.drawing_utils
-mp_drawing_styles = mp.solutions.drawing_styles
-mp_face_mesh = mp.solutions.face_mesh
+import numpy as np
+
+# Per-session opt-in with /ws/video?facemesh=1; 0 here refuses it server-wide
+FACEMESH = os.environ.get("FACEMESH", "1").lower() in ("1", "true", "yes")
+# Face mesh runs at most this often per session, and only on frames with a person
+FACEMESH_INTERVAL_SECONDS = float(os.environ.get("FACEMESH_INTERVAL_SECONDS", "0.5"))
+FACEMESH_MAX_FACES = int(os.environ.get("FACEMESH_MAX_FACES", "1"))
+# 1: also send all 478 normalized (x, y) landmarks per face
+FACEMESH_LANDMARKS = os.environ.get("FACEMESH_LANDMARKS", "0").lower() in ("1", "true", "yes")
+
+# Landmark indices in MediaPipe's face mesh topology
+LEFT_EYE = (33, 160, 158, 133, 153, 144)
+RIGHT_EYE = (362, 385, 387, 263, 373, 380)
+MOUTH = (13, 14, 78, 308)
+NOSE_TIP = 1
+
+def eye_openness(points, eye):
+    """Eye aspect ratio: about 0.3 open, under 0.15 closed."""
+    p1, p2, p3, p4, p5, p6 = points[list(eye)]
+    return float((np.linalg.norm(p2 - p6) + np.linalg.norm(p3 - p5)) / (2 * np.linalg.norm(p1 - p4) + 1e-6))
+
+def face_features(points, frame_size):
+    """Compact per-face features from landmarks in pixels."""
+    upper, lower, left, right = points[list(MOUTH)]
+    eye_center = (points[LEFT_EYE[0]] + points[RIGHT_EYE[3]]) / 2
+    eye_distance = np.linalg.norm(points[RIGHT_EYE[3]] - points[LEFT_EYE[0]]) + 1e-6
+    x1, y1 = points.min(axis=0)
+    x2, y2 = points.max(axis=0)
+    width, height = frame_size
+    face = {
+        "box": [float(x1), float(y1), float(x2), float(y2)],
+        "left_eye": round(eye_openness(points, LEFT_EYE), 3),
+        "right_eye": round(eye_openness(points, RIGHT_EYE), 3),
+        "mouth": round(float(np.linalg.norm(upper - lower) / (np.linalg.norm(left - right) + 1e-6)), 3),
+        # Nose offset from between the eyes, in eye distances; near 0 facing the camera
+        "yaw": round(float((points[NOSE_TIP][0] - eye_center[0]) / eye_distance), 3),
+    }
+    if FACEMESH_LANDMARKS:
+        face["landmarks"] = np.round(points / (width, height), 4).tolist()
+    return face
+
+class FaceMeshStage:
+    """MediaPipe face mesh for one session, in tracking mode.
+
+    The instance keeps its state between frames, so after the first
+    detection MediaPipe follows the face instead of searching the whole
+    frame again. It runs on the frame the server already decoded, only when
+    a person was detected, and at most every FACEMESH_INTERVAL_SECONDS.
+    Between runs the last faces are reported.
+    """
+
+    def __init__(self, interval_seconds=FACEMESH_INTERVAL_SECONDS, max_faces=FACEMESH_MAX_FACES):
+        import mediapipe as mp
+
+        self.face_mesh = mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=False,
+            max_num_faces=max_faces,
+            refine_landmarks=True,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+        self.interval_seconds = interval_seconds
+        # MediaPipe graphs aren't safe to close while processing
+        self.lock = Lock()
+        self.last_run = None
+        self.faces = []
+
+    def due(self, detected_objects):
+        if not any(obj["class"] == "person" for obj in detected_objects or []):
+            self.faces = []
+            return False
+        return self.last_run is None or time.monotonic() - self.last_run >= self.interval_seconds
 
-# For static images:
-IMAGE_FILES = []
-drawing_spec = mp_drawing.DrawingSpec(thickness=1, circle_radius=1)
-with mp_face_mesh.FaceMesh(
-    static_image_mode=True,
-    max_num_faces=1,
-    refine_landmarks=True,
-    min_detection_confidence=0.5) as face_mesh:
-  for idx, file in enumerate(IMAGE_FILES):
-    image = cv2.imread(file)
-    # Convert the BGR image to RGB before processing.
-    results = face_mesh.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    def process(self, frame):
+        """Landmark features for the faces in a BGR frame; the frame is not modified."""
+        self.last_run = time.monotonic()
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        rgb.flags.writeable = False
+        with self.lock:
+            results = self.face_mesh.process(rgb)
+        height, width = frame.shape[:2]
+        self.faces = [
+            face_features(
+                np.array([(lm.x * width, lm.y * height) for lm in face_landmarks.landmark], dtype=np.float32),
+                (width, height)
+            )
+            for face_landmarks in results.multi_face_landmarks or []
+        ]
+        return self.faces
 
-    # Print and draw face mesh landmarks on the image.
-    if not results.multi_face_landmarks:
-      continue
-    annotated_image = image.copy()
-    for face_landmarks in results.multi_face_landmarks:
-      print('face_landmarks:', face_landmarks)
-      mp_drawing.draw_landmarks(
-          image=annotated_image,
-          landmark_list=face_landmarks,
-          connections=mp_face_mesh.FACEMESH_TESSELATION,
-          landmark_drawing_spec=None,
-          connection_drawing_spec=mp_drawing_styles
-          .get_default_face_mesh_tesselation_style())
-      mp_drawing.draw_landmarks(
-          image=annotated_image,
-          landmark_list=face_landmarks,
-          connections=mp_face_mesh.FACEMESH_CONTOURS,
-          landmark_drawing_spec=None,
-          connection_drawing_spec=mp_drawing_styles
-          .get_default_face_mesh_contours_style())
-      mp_drawing.draw_landmarks(
-          image=annotated_image,
-          landmark_list=face_landmarks,
-          connections=mp_face_mesh.FACEMESH_IRISES,
-          landmark_drawing_spec=None,
-          connection_drawing_spec=mp_drawing_styles
-          .get_default_face_mesh_iris_connections_style())
-    cv2.imwrite('/tmp/annotated_image' + str(idx) + '.png', annotated_image)
+    def close(self):
+        with self.lock:
+            self.face_mesh.close()
 
-# For webcam input:
-drawing_spec = mp_drawing.DrawingSpec(thickness=1, circle_radius=1)
-cap = cv2.VideoCapture(0)
-with mp_face_mesh.FaceMesh(
-    max_num_faces=1,
-    refine_landmarks=True,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5) as face_mesh:
-  while cap.isOpened():
-    success, image = cap.read()
-    if not success:
-      print("Ignoring empty camera frame.")
-      # If loading a video, use 'break' instead of 'continue'.
-      continue
+def create_stage():
+    """A session's stage, or None when face mesh is off or MediaPipe isn't installed."""
+    if not FACEMESH:
+        return None
+    try:
+        return FaceMeshStage()
+    except ImportError:
+        print("⚠️ Face mesh requested but mediapipe is not installed")
+        return None
 
-    # To improve performance, optionally mark the image as not writeable to
-    # pass by reference.
-    image.flags.writeable = False
-    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    results = face_mesh.process(image)
+def main():
+    """Webcam preview: the stage's features drawn over the camera image."""
+    stage = FaceMeshStage(interval_seconds=0)
+    cap = cv2.VideoCapture(0)
+    try:
+        while cap.isOpened():
+            success, image = cap.read()
+            if not success:
+                print("Ignoring empty camera frame.")
+                continue
+            for face in stage.process(image):
+                x1, y1, x2, y2 = map(int, face["box"])
+                cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 1)
+                label = f"eyes {face['left_eye']:.2f}/{face['right_eye']:.2f} mouth {face['mouth']:.2f} yaw {face['yaw']:+.2f}"
+                cv2.putText(image, label, (x1, max(15, y1 - 5)), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 0), 1)
+            cv2.imshow('MediaPipe Face Mesh', image)
+            if cv2.waitKey(5) & 0xFF == 27:
+                break
+    finally:
+        cap.release()
+        stage.close()
 
-    # Draw the face mesh annotations on the image.
-    image.flags.writeable = True
-    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-    if results.multi_face_landmarks:
-      for face_landmarks in results.multi_face_landmarks:
-        mp_drawing.draw_landmarks(
-            image=image,
-            landmark_list=face_landmarks,
-            connections=mp_face_mesh.FACEMESH_TESSELATION,
-            landmark_drawing_spec=None,
-            connection_drawing_spec=mp_drawing_styles
-            .get_default_face_mesh_tesselation_style())
-        mp_drawing.draw_landmarks(
-            image=image,
-            landmark_list=face_landmarks,
-            connections=mp_face_mesh.FACEMESH_CONTOURS,
-            landmark_drawing_spec=None,
-            connection_drawing_spec=mp_drawing_styles
-            .get_default_face_mesh_contours_style())
-        mp_drawing.draw_landmarks(
-            image=image,
-            landmark_list=face_landmarks,
-            connections=mp_face_mesh.FACEMESH_IRISES,
-            landmark_drawing_spec=None,
-            connection_drawing_spec=mp_drawing_styles
-            .get_default_face_mesh_iris_connections_style())
-    # Flip the image horizontally for a selfie-view display.
-    cv2.imshow('MediaPipe Face Mesh', cv2.flip(image, 1))
-    if cv2.waitKey(5) & 0xFF == 27:
-      break
-cap.release()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import base64
+import os
+import cv2
+import numpy as np
+
+# Long side the models actually need; YOLO runs at 640 and depth at 518
+FRAME_TARGET_SIZE = int(os.environ.get("FRAME_TARGET_SIZE", "640"))
+
+# libjpeg can decode straight to 1/2, 1/4 or 1/8 scale by skipping DCT work
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# Start-of-frame markers that carry the image size (C4, C8 and CC are not SOF)
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def jpeg_size(data):
+    """Read (width, height) from a JPEG header without decoding it."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    while i + 3 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # Fill byte before the actual marker
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            i += 2
+            continue
+        if marker in SOF_MARKERS:
+            if i + 9 > len(data):
+                return None
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return width, height
+        i += 2 + ((data[i + 2] << 8) | data[i + 3])
+    return None
+
+class FrameDecoder:
+    """Decodes client JPEGs at the resolution the models need.
+
+    The JPEG is decoded at the largest 1/2, 1/4 or 1/8 scale that still
+    covers `target_size`, and any remaining downscale is written into a
+    pooled buffer. Frames handed back through `recycle` are reused for
+    later frames of the same shape, so a steady stream allocates nothing.
+    """
+
+    def __init__(self, target_size=FRAME_TARGET_SIZE, pool_size=4):
+        self.target_size = target_size
+        self.pool_size = pool_size
+        self._free = {}
+
+    def _reduced_flag(self, data):
+        size = jpeg_size(data)
+        if size is None:
+            return cv2.IMREAD_COLOR
+        long_side = max(size)
+        for scale, flag in REDUCED_DECODE_FLAGS:
+            if long_side // scale >= self.target_size:
+                return flag
+        return cv2.IMREAD_COLOR
+
+    def _buffer(self, shape):
+        free = self._free.get(shape)
+        if free:
+            return free.pop()
+        return np.empty(shape, dtype=np.uint8)
+
+    def recycle(self, frame):
+        """Return a frame nobody reads any more so its memory can be reused."""
+        if frame is None:
+            return
+        free = self._free.setdefault(frame.shape, [])
+        if len(free) < self.pool_size:
+            free.append(frame)
+
+    def decode(self, data):
+        """Decode raw JPEG bytes into a BGR frame, or None if invalid."""
+        np_data = np.frombuffer(data, np.uint8)
+        frame = cv2.imdecode(np_data, self._reduced_flag(data))
+        if frame is None:
+            return None
+
+        h, w = frame.shape[:2]
+        long_side = max(h, w)
+        if long_side <= self.target_size:
+            return frame
+
+        scale = self.target_size / long_side
+        shape = (max(1, round(h * scale)), max(1, round(w * scale)), 3)
+        resized = self._buffer(shape)
+        cv2.resize(frame, (shape[1], shape[0]), dst=resized, interpolation=cv2.INTER_AREA)
+        return resized
+
+    def decode_base64(self, data):
+        return self.decode(base64.b64decode(data))
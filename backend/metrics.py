@@ -0,0 +1,135 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, REGISTRY
+
+# Per-frame stages of /ws/video; "inference" is detection + depth in a worker process
+STAGES = ("decode", "detection", "depth", "inference", "depth_postprocess", "translation", "send")
+# 1 ms .. 5 s: decode and send sit at the low end, model stages in the middle
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+stage_seconds = Histogram(
+    "aromatic_stage_seconds",
+    "Per-frame time spent in each /ws/video stage, including queueing",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+stage_errors = Counter("aromatic_stage_errors_total", "Frames that failed in a stage", ["stage"])
+frame_seconds = Histogram(
+    "aromatic_frame_seconds",
+    "Time from a decoded frame to its response being ready",
+    buckets=LATENCY_BUCKETS
+)
+frames_received = Counter("aromatic_frames_received_total", "Frames decoded from /ws/video")
+frames_dropped = Counter("aromatic_frames_dropped_total", "Frames replaced by a newer one before inference")
+results_dropped = Counter("aromatic_results_dropped_total", "Responses replaced by a newer one before sending")
+frames_cached = Counter("aromatic_frames_cached_total", "Frames answered from the scene cache without inference")
+detections_skipped = Counter("aromatic_detections_skipped_total", "Frames whose objects came from the tracker instead of YOLO")
+sessions_evicted = Counter("aromatic_sessions_evicted_total", "Sessions closed and dropped after being idle")
+results_suppressed = Counter("aromatic_results_suppressed_total", "Responses not sent in delta mode because nothing changed")
+bytes_sent = Counter("aromatic_bytes_sent_total", "Result bytes written to /ws/video sockets", ["encoding"])
+frames_rate_limited = Counter("aromatic_frames_rate_limited_total", "Frames over their session's rate limit, dropped before decoding")
+frames_expired = Counter("aromatic_frames_expired_total", "Frames dropped because they could not reach the models before their deadline")
+sessions_admitted = Counter("aromatic_sessions_admitted_total", "New /ws/video sessions by admission status", ["status"])
+batch_seconds = Histogram(
+    "aromatic_batch_seconds",
+    "Model time of one micro-batch",
+    ["batcher"],
+    buckets=LATENCY_BUCKETS
+)
+batch_size = Histogram("aromatic_batch_size", "Items per micro-batch", ["batcher"], buckets=(1, 2, 3, 4, 6, 8, 12, 16))
+queue_depth = Gauge("aromatic_queue_depth", "Items waiting in a micro-batcher queue", ["batcher"])
+executor_busy = Gauge("aromatic_executor_busy", "Tasks submitted to an executor and not finished yet", ["executor"])
+executor_workers = Gauge("aromatic_executor_workers", "Threads of an executor", ["executor"])
+active_sessions = Gauge("aromatic_active_sessions", "Connected /ws/video sessions")
+paused_sessions = Gauge("aromatic_paused_sessions", "Sessions paused by their client")
+sessions = Gauge("aromatic_sessions", "Sessions held by the server, connected or waiting for a reconnect")
+inference_load = Gauge("aromatic_inference_load", "Frames in the models relative to one round of batches")
+node_outstanding = Gauge("aromatic_node_outstanding", "Frames sent to an inference node and not answered yet", ["node"])
+node_failovers = Counter("aromatic_node_failovers_total", "Frames sent to another inference node after one failed or timed out")
+scheduler_pressure = Gauge("aromatic_scheduler_pressure", "Frames in or waiting for the models per scheduler slot")
+model_level = Gauge("aromatic_model_level", "Model resolution level, 0 = full resolution")
+
+# Every stage shows up from the first scrape, even before it has seen a frame
+for stage in STAGES:
+    stage_seconds.labels(stage)
+    stage_errors.labels(stage)
+
+@contextmanager
+def timed(stage):
+    """Observe the duration of the block under `stage`; exceptions count as stage errors."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.labels(stage).inc()
+        raise
+    finally:
+        stage_seconds.labels(stage).observe(time.perf_counter() - start)
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that reports how many of its tasks are queued or running.
+
+    busy / workers above 1 means work is waiting for a thread.
+    """
+
+    def __init__(self, max_workers, thread_name_prefix, initializer=None):
+        super().__init__(max_workers=max_workers, thread_name_prefix=thread_name_prefix, initializer=initializer)
+        self._busy = executor_busy.labels(thread_name_prefix)
+        executor_workers.labels(thread_name_prefix).set(max_workers)
+
+    def submit(self, fn, /, *args, **kwargs):
+        self._busy.inc()
+        future = super().submit(fn, *args, **kwargs)
+        future.add_done_callback(self._task_done)
+        return future
+
+    def _task_done(self, _):
+        self._busy.dec()
+
+class TranslationCacheCollector:
+    """Exposes TranslationService hit/miss counts, which it keeps itself."""
+
+    def __init__(self, service):
+        self.service = service
+
+    def collect(self):
+        lookups = CounterMetricFamily(
+            "aromatic_translation_lookups",
+            "Translation lookups by result (hit: memory or SQLite cache, miss: upstream)",
+            labels=["result"]
+        )
+        lookups.add_metric(["hit"], self.service.hits)
+        lookups.add_metric(["miss"], self.service.misses)
+        yield lookups
+
+def register_translation_service(service):
+    REGISTRY.register(TranslationCacheCollector(service))
+
+class ComputeBudgetCollector:
+    """Cores of each CPU budget stage and how busy they were since the last scrape."""
+
+    def __init__(self, budget):
+        self.budget = budget
+
+    def collect(self):
+        cores = GaugeMetricFamily("aromatic_stage_cpu_cores", "Cores budgeted to a stage", labels=["stage"])
+        utilization = GaugeMetricFamily(
+            "aromatic_stage_cpu_utilization",
+            "Busy share of a stage's cores since the previous scrape, 0..1",
+            labels=["stage"]
+        )
+        for stage, stage_budget in self.budget.stages.items():
+            cores.add_metric([stage], len(stage_budget.cores))
+            utilization.add_metric([stage], self.budget.utilization(stage))
+        yield cores
+        yield utilization
+
+def register_compute_budget(budget):
+    REGISTRY.register(ComputeBudgetCollector(budget))
+
+def render():
+    """Prometheus text exposition of every metric; returns (body, content type)."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,98 @@
+import os
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+# 1: load and warm up every model in a background task at startup; 0: load on first use
+PRELOAD_MODELS = os.environ.get("PRELOAD_MODELS", "1").lower() in ("1", "true", "yes")
+
+# Warm-up input shaped like a decoded camera frame
+WARMUP_FRAME_SHAPE = (480, 640, 3)
+
+class ModelEntry:
+    def __init__(self, name: str, loader: Callable[[], Any], warmup: Optional[Callable[[Any], Any]]):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.model = None
+        self.status = "pending"
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.error = None
+        self.lock = Lock()
+
+class ModelRegistry:
+    """Loads models on first use or in the background, each exactly once.
+
+    Registering a model loads nothing, so importing the modules that
+    register one (and the app) stays fast; heavy imports like torch happen
+    inside the loaders.
+
+    `get` blocks until the model is loaded and warmed up, so callers in
+    executor threads simply wait while a startup load is still running.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, ModelEntry] = {}
+
+    def register(self, name: str, loader: Callable[[], Any], warmup: Optional[Callable[[Any], Any]] = None):
+        self._entries[name] = ModelEntry(name, loader, warmup)
+
+    def names(self):
+        return list(self._entries)
+
+    def get(self, name: str):
+        entry = self._entries[name]
+        if entry.model is not None:
+            return entry.model
+
+        with entry.lock:
+            if entry.model is not None:
+                return entry.model
+            entry.status = "loading"
+            entry.error = None
+            print(f"🔄 Loading {name} model")
+            try:
+                start = time.perf_counter()
+                model = entry.loader()
+                entry.load_seconds = round(time.perf_counter() - start, 3)
+
+                # One synthetic inference so the first real frame doesn't pay for lazy init
+                if entry.warmup is not None:
+                    entry.status = "warming_up"
+                    start = time.perf_counter()
+                    entry.warmup(model)
+                    entry.warmup_seconds = round(time.perf_counter() - start, 3)
+            except Exception as e:
+                entry.status = "failed"
+                entry.error = str(e)
+                print(f"❌ Failed to load {name} model: {str(e)}")
+                raise
+
+            entry.model = model
+            entry.status = "ready"
+            warmup = f", warm-up {entry.warmup_seconds}s" if entry.warmup_seconds is not None else ""
+            print(f"✅ {name} model ready (load {entry.load_seconds}s{warmup})")
+        return entry.model
+
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        entries = [self._entries[name]] if name else self._entries.values()
+        return all(entry.status == "ready" for entry in entries)
+
+    def status(self) -> dict:
+        return {
+            name: {
+                "status": entry.status,
+                "load_seconds": entry.load_seconds,
+                "warmup_seconds": entry.warmup_seconds,
+                "error": entry.error,
+            }
+            for name, entry in self._entries.items()
+        }
+
+def warmup_frame():
+    return np.zeros(WARMUP_FRAME_SHAPE, dtype=np.uint8)
+
+registry = ModelRegistry()
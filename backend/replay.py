@@ -0,0 +1,228 @@
+"""Replay recorded footage through the detection, depth and translation pipeline.
+
+Run from backend/, e.g.:
+
+    python replay.py field/*.mp4 frames_dir/ --output results.jsonl --batch-size 16 --target hi
+
+Video files and directories of JPEG/PNG frames are read as a stream:
+a reader thread decodes ahead of the models (directories with several
+decode threads) into a bounded queue, batches go through the same YOLO
+and depth engines the server uses, and each batch's results are appended
+to the JSONL file as soon as they are ready. Memory stays bounded by the
+batch size however long the footage is. The summary at the end doubles as
+a maximum-throughput benchmark.
+
+Each line holds the source, frame index and timestamp plus the fields a
+/ws/video client gets: depth, confidence, method, objects and
+translated_text, plus grid with --grid.
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from queue import Queue
+
+import cv2
+import orjson
+
+import backends  # registers the YOLO model
+from control import QUALITY_LEVELS
+from depth import ObstacleGrid, depth_from_map, detected_objects_from_results
+from frames import FRAME_TARGET_SIZE, FrameDecoder
+from models import registry
+from translation import PhraseEngine
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+# Marks the end of the reader's stream
+DONE = object()
+
+def fit_frame(frame, target_size=FRAME_TARGET_SIZE):
+    """Downscale like the server's decoder, so replay sees what a client upload would."""
+    h, w = frame.shape[:2]
+    long_side = max(h, w)
+    if long_side <= target_size:
+        return frame
+    scale = target_size / long_side
+    return cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+
+def video_frames(path, stride):
+    capture = cv2.VideoCapture(str(path))
+    if not capture.isOpened():
+        print(f"⚠️ Cannot open video: {path}")
+        return
+    try:
+        index = 0
+        while True:
+            if index % stride:
+                # grab() skips the decode of frames that aren't replayed
+                if not capture.grab():
+                    break
+            else:
+                success, frame = capture.read()
+                if not success:
+                    break
+                yield index, capture.get(cv2.CAP_PROP_POS_MSEC), fit_frame(frame)
+            index += 1
+    finally:
+        capture.release()
+
+def directory_frames(path, stride, decode_workers, chunk):
+    """Image files in name order, decoded `chunk` at a time across threads."""
+    paths = sorted(p for p in Path(path).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)[::stride]
+    local = threading.local()
+
+    def decode(file_path):
+        decoder = getattr(local, "decoder", None)
+        if decoder is None:
+            decoder = local.decoder = FrameDecoder()
+        frame = decoder.decode(file_path.read_bytes())
+        return fit_frame(frame) if frame is not None else None
+
+    with ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="decode") as pool:
+        for start in range(0, len(paths), chunk):
+            batch = paths[start:start + chunk]
+            for offset, frame in enumerate(pool.map(decode, batch)):
+                if frame is None:
+                    print(f"⚠️ Cannot decode frame: {batch[offset]}")
+                    continue
+                yield (start + offset) * stride, None, frame
+
+def read_sources(sources, args, frames):
+    """Reader thread: every source's frames into the bounded `frames` queue."""
+    count = 0
+    try:
+        for source in sources:
+            path = Path(source)
+            if path.is_dir():
+                stream = directory_frames(path, args.stride, args.decode_workers, args.batch_size)
+            else:
+                stream = video_frames(path, args.stride)
+            for index, time_ms, frame in stream:
+                frames.put((source, index, time_ms, frame))
+                count += 1
+                if args.max_frames and count >= args.max_frames:
+                    return
+    finally:
+        frames.put(DONE)
+
+def batches(frames, batch_size):
+    batch = []
+    while True:
+        item = frames.get()
+        if item is DONE:
+            break
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class Replay:
+    """Runs batches through the models with detection and depth side by side."""
+
+    def __init__(self, args):
+        self.level = QUALITY_LEVELS[args.level]
+        self.target_lang = args.target
+        self.smoothing = args.smoothing
+        self.buffers = {}
+        # Per source, like per session; None without --grid
+        self.grids = {} if args.grid else None
+        self.pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="replay")
+        self.stage_seconds = {"detection": 0.0, "depth": 0.0, "postprocess": 0.0}
+
+        # The app isn't imported: it would build the server's executors, pools and thread budget
+        self.phrase_engine = PhraseEngine(registry.get("yolo").names.values())
+        self.phrase_engine.phrases(self.target_lang)
+        registry.get("depth")
+
+    def _timed(self, stage, run, *args):
+        start = time.perf_counter()
+        result = run(*args)
+        self.stage_seconds[stage] += time.perf_counter() - start
+        return result
+
+    def _detect(self, frames):
+        return registry.get("yolo")(frames, imgsz=self.level.yolo_imgsz, verbose=False)
+
+    def _depth(self, frames):
+        return registry.get("depth").infer(frames, self.level.depth_input_size)
+
+    def run_batch(self, batch):
+        frames = [frame for _, _, _, frame in batch]
+        detection = self.pool.submit(self._timed, "detection", self._detect, frames)
+        depth = self.pool.submit(self._timed, "depth", self._depth, frames)
+        results, depth_maps = detection.result(), depth.result()
+
+        start = time.perf_counter()
+        lines = []
+        for (source, index, time_ms, frame), result, depth_map in zip(batch, results, depth_maps):
+            detected_objects = detected_objects_from_results(result)
+            # Smoothed per source, as the server smooths per session
+            buffer = self.buffers.setdefault(source, deque(maxlen=8 if self.smoothing else 1))
+            grid = self.grids.setdefault(source, ObstacleGrid()) if self.grids is not None else None
+            depth_result = depth_from_map(depth_map, detected_objects, (frame.shape[1], frame.shape[0]), buffer, grid) or {}
+            objects = depth_result.get("objects") or []
+            labels = [obj["class"] for obj in objects] if objects else [obj["class"] for obj in detected_objects]
+            line = {
+                "source": source,
+                "frame": index,
+                "time_ms": round(time_ms, 1) if time_ms is not None else None,
+                "depth": depth_result.get("depth"),
+                "confidence": depth_result.get("confidence", 0),
+                "method": depth_result.get("method", "none"),
+                "objects": objects or detected_objects,
+                "translated_text": self.phrase_engine.sentence(labels, depth_result.get("depth"), self.target_lang),
+            }
+            if grid is not None:
+                line["grid"] = depth_result.get("grid")
+            lines.append(line)
+        self.stage_seconds["postprocess"] += time.perf_counter() - start
+        return lines
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", help="video files and/or directories of frames")
+    parser.add_argument("--output", "-o", required=True, help="JSONL file to write")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--decode-workers", type=int, default=4, help="decode threads for frame directories")
+    parser.add_argument("--stride", type=int, default=1, help="replay every Nth frame")
+    parser.add_argument("--max-frames", type=int, default=0, help="stop after this many frames (0: all)")
+    parser.add_argument("--target", default="en", help="language of translated_text")
+    parser.add_argument("--level", type=int, default=0, choices=range(len(QUALITY_LEVELS)),
+                        help="model resolution level, 0 = full resolution")
+    parser.add_argument("--no-smoothing", dest="smoothing", action="store_false",
+                        help="score every frame on its own instead of smoothing distances like a session")
+    parser.add_argument("--grid", action="store_true", help="add the obstacle grid (?grid=1) to each line")
+    args = parser.parse_args()
+    args.stride = max(1, args.stride)
+
+    replay = Replay(args)
+    # Two batches decoded ahead keep the models busy without holding the whole video
+    frames = Queue(maxsize=2 * args.batch_size)
+    reader = threading.Thread(target=read_sources, args=(args.sources, args, frames), daemon=True)
+
+    count = 0
+    start = time.perf_counter()
+    reader.start()
+    with open(args.output, "wb") as out:
+        for batch in batches(frames, args.batch_size):
+            for line in replay.run_batch(batch):
+                out.write(orjson.dumps(line, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n")
+            out.flush()
+            count += len(batch)
+            elapsed = time.perf_counter() - start
+            print(f"\r🔄 {count} frames, {count / elapsed:.1f} fps", end="", file=sys.stderr, flush=True)
+    elapsed = time.perf_counter() - start
+    replay.pool.shutdown()
+
+    print(file=sys.stderr)
+    print(f"✅ {count} frames in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.1f} fps) -> {args.output}")
+    for stage, seconds in replay.stage_seconds.items():
+        print(f"   {stage:<12}{seconds:8.2f}s{1000 * seconds / count if count else 0:9.1f} ms/frame")
+
+if __name__ == "__main__":
+    main()
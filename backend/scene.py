@@ -0,0 +1,20 @@
+import os
+import cv2
+import numpy as np
+
+# Frames are compared as tiny grayscale thumbnails, which costs well under a millisecond
+SCENE_THUMBNAIL_SIZE = (32, 24)
+# Mean absolute per-pixel difference (0-255) above which the scene counts as changed
+SCENE_CHANGE_THRESHOLD = float(os.environ.get("SCENE_CHANGE_THRESHOLD", "6.0"))
+
+def scene_thumbnail(frame):
+    small = cv2.resize(frame, SCENE_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.float32)
+
+def scene_changed(thumbnail, reference, threshold=SCENE_CHANGE_THRESHOLD):
+    """Compare two thumbnails, ignoring global brightness shifts from auto-exposure."""
+    if reference is None or reference.shape != thumbnail.shape:
+        return True
+    diff = thumbnail - reference
+    diff -= diff.mean()
+    return float(np.abs(diff).mean()) > threshold
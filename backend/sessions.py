@@ -0,0 +1,100 @@
+import asyncio
+import heapq
+import os
+import secrets
+import time
+
+# Connected and streaming, but no frame or control message for this long: closed
+SESSION_IDLE_SECONDS = float(os.environ.get("SESSION_IDLE_SECONDS", "30"))
+# Paused clients send nothing on purpose, so they get much longer
+SESSION_PAUSED_IDLE_SECONDS = float(os.environ.get("SESSION_PAUSED_IDLE_SECONDS", "600"))
+# After the socket drops, a reconnect with the same token resumes the session within this window
+SESSION_RESUME_SECONDS = float(os.environ.get("SESSION_RESUME_SECONDS", "60"))
+
+def new_session_token():
+    return secrets.token_urlsafe(16)
+
+class IdleEvictor:
+    """Calls `on_expire(key)` once a key's deadline passes without being pushed back.
+
+    Deadlines live in a min-heap. Touching a key usually just records its
+    new, later deadline in a dict, without touching the heap; when the old
+    heap entry comes up, it is re-filed at the recorded deadline. Each key
+    has one live heap entry, so a touch is O(1) in the common case, an
+    expiry is O(log n), and nothing scans all sessions. The loop sleeps
+    until the earliest deadline.
+    """
+
+    def __init__(self, on_expire):
+        self.on_expire = on_expire
+        self.heap = []
+        # key -> (deadline, generation of its live heap entry)
+        self.deadlines = {}
+        self._generation = 0
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def _push(self, deadline, key):
+        self._generation += 1
+        self.deadlines[key] = (deadline, self._generation)
+        heapq.heappush(self.heap, (deadline, self._generation, key))
+        if len(self.heap) > 2 * len(self.deadlines) + 64:
+            # Mostly stale entries from shortened deadlines: rebuild from the live ones
+            self.heap = [(deadline, generation, key) for key, (deadline, generation) in self.deadlines.items()]
+            heapq.heapify(self.heap)
+        if self.heap[0][2] == key:
+            self._wake.set()
+
+    def touch(self, key, timeout):
+        """(Re)arm `key` to expire `timeout` seconds from now."""
+        deadline = time.monotonic() + timeout
+        current = self.deadlines.get(key)
+        if current is not None and deadline >= current[0]:
+            # Later than the entry already in the heap: fixed up when that entry pops
+            self.deadlines[key] = (deadline, current[1])
+        else:
+            # Earlier (or new) needs its own entry; the old one goes stale
+            self._push(deadline, key)
+
+    def remove(self, key):
+        # Its heap entry is skipped when it comes up
+        self.deadlines.pop(key, None)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            while self.heap and self.heap[0][0] <= now:
+                deadline, generation, key = heapq.heappop(self.heap)
+                current = self.deadlines.get(key)
+                if current is None or current[1] != generation:
+                    continue
+                if current[0] > deadline:
+                    self._push(current[0], key)
+                    continue
+                del self.deadlines[key]
+                try:
+                    await self.on_expire(key)
+                except Exception as e:
+                    print(f"❌ Session eviction error: {key} - {str(e)}")
+            self._wake.clear()
+            timeout = self.heap[0][0] - time.monotonic() if self.heap else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,152 @@
+import os
+import time
+
+import orjson
+
+# Full state at least this often in delta mode, so a client that missed something recovers
+DELTA_KEYFRAME_SECONDS = float(os.environ.get("DELTA_KEYFRAME_SECONDS", "5.0"))
+# Distance changes below this (cm) are not worth a message
+DELTA_DISTANCE_CM = float(os.environ.get("DELTA_DISTANCE_CM", "10.0"))
+# Confidence only moves while the smoothing window fills; small steps are dropped
+DELTA_CONFIDENCE = 0.25
+ENCODINGS = ("json", "msgpack")
+
+def object_keys(objects):
+    """Stable key per object: the track id, else class plus rank within the class."""
+    keys = []
+    seen = {}
+    for obj in objects:
+        if "track_id" in obj:
+            keys.append(f"track:{obj['track_id']}")
+            continue
+        rank = seen.get(obj["class"], 0)
+        seen[obj["class"]] = rank + 1
+        keys.append(f"{obj['class']}:{rank}")
+    return keys
+
+def _moved(new, old, threshold):
+    if new is None or old is None:
+        return new is not old
+    return abs(new - old) >= threshold
+
+def _grid_moved(new, old, threshold):
+    """Whether any obstacle grid cell moved by `threshold` cm; the grid is sent whole."""
+    if new is None or old is None or len(new) != len(old):
+        return new is not old
+    return any(
+        _moved(cell, old_cell, threshold)
+        for row, old_row in zip(new, old)
+        for cell, old_cell in zip(row, old_row)
+    )
+
+class ResultEncoder:
+    """Turns per-frame responses into what actually goes down one session's socket.
+
+    Without delta mode every response is sent in full. In delta mode the
+    encoder remembers the state it last sent and emits only the fields that
+    changed meaningfully, or nothing at all, plus a full keyframe every
+    DELTA_KEYFRAME_SECONDS. Messages carry "type" ("keyframe" or "delta")
+    and a sequence number so clients can spot gaps.
+    """
+
+    def __init__(self, delta=False, encoding="json", keyframe_seconds=DELTA_KEYFRAME_SECONDS,
+                 distance_cm=DELTA_DISTANCE_CM):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding '{encoding}', expected one of {', '.join(ENCODINGS)}")
+        self.delta = delta
+        self.encoding = encoding
+        self.keyframe_seconds = keyframe_seconds
+        self.distance_cm = distance_cm
+        self.sent = None
+        self.sent_objects = {}
+        self.keyframe_at = 0.0
+        self.seq = 0
+        self.suppressed = 0
+
+    @property
+    def binary(self):
+        return self.encoding == "msgpack"
+
+    def serialize(self, message):
+        if self.encoding == "msgpack":
+            import msgpack
+            return msgpack.packb(message, use_bin_type=True)
+        return orjson.dumps(message).decode()
+
+    def encode(self, response):
+        """Serialized message for `response`, or None when there is nothing new to say."""
+        if not self.delta or response.get("status") != "success":
+            return self.serialize(response)
+
+        now = time.monotonic()
+        if self.sent is None or now - self.keyframe_at >= self.keyframe_seconds:
+            message = {"type": "keyframe", **response}
+            self._remember(response)
+            self.keyframe_at = now
+        else:
+            message = self._diff(response)
+            if message is None:
+                self.suppressed += 1
+                return None
+
+        self.seq += 1
+        message["seq"] = self.seq
+        return self.serialize(message)
+
+    def reset(self):
+        """Make the next message a keyframe, e.g. after the session's language changed."""
+        self.sent = None
+
+    def _remember(self, response):
+        self.sent = dict(response)
+        objects = response.get("objects", [])
+        self.sent_objects = dict(zip(object_keys(objects), objects))
+
+    def _diff(self, response):
+        sent = self.sent
+        changes = {}
+        if _moved(response.get("depth"), sent.get("depth"), self.distance_cm):
+            changes["depth"] = response.get("depth")
+            sent["depth"] = response.get("depth")
+        if _moved(response.get("confidence"), sent.get("confidence"), DELTA_CONFIDENCE):
+            changes["confidence"] = response.get("confidence")
+            sent["confidence"] = response.get("confidence")
+        for field in ("method", "control", "faces"):
+            if field in response and response[field] != sent.get(field):
+                changes[field] = response[field]
+                sent[field] = response[field]
+        if "grid" in response and _grid_moved(response["grid"], sent.get("grid"), self.distance_cm):
+            changes["grid"] = response["grid"]
+            sent["grid"] = response["grid"]
+        if response.get("events"):
+            changes["events"] = response["events"]
+
+        added, updated = [], []
+        objects = response.get("objects", [])
+        current = dict(zip(object_keys(objects), objects))
+        for key, obj in current.items():
+            previous = self.sent_objects.get(key)
+            if previous is None:
+                added.append({"key": key, **obj})
+                self.sent_objects[key] = obj
+            elif _moved(obj.get("distance"), previous.get("distance"), self.distance_cm):
+                updated.append({"key": key, **obj})
+                self.sent_objects[key] = obj
+        removed = [key for key in self.sent_objects if key not in current]
+        for key in removed:
+            del self.sent_objects[key]
+        if added:
+            changes["objects_added"] = added
+        if updated:
+            changes["objects_updated"] = updated
+        if removed:
+            changes["objects_removed"] = removed
+
+        # The sentence embeds the distance, so it goes out only alongside a change it describes
+        if changes.keys() - {"confidence", "control"} and response.get("translated_text") != sent.get("translated_text"):
+            changes["translated_text"] = response.get("translated_text")
+            sent["translated_text"] = response.get("translated_text")
+
+        if not changes:
+            return None
+        return {"type": "delta", **changes}
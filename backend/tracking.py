@@ -0,0 +1,123 @@
+import os
+
+import numpy as np
+
+# 1: run YOLO every few frames and let ByteTrack carry objects in between
+TRACKING = os.environ.get("TRACKING", "0").lower() in ("1", "true", "yes")
+# Full detection at least every N frames that reach the models
+TRACK_DETECT_INTERVAL = int(os.environ.get("TRACK_DETECT_INTERVAL", "5"))
+# Below this share of tracks re-found by a detection, the next frame detects again
+TRACK_MIN_MATCH_RATIO = float(os.environ.get("TRACK_MIN_MATCH_RATIO", "0.5"))
+# Detections a lost track survives before it is reported gone
+TRACK_BUFFER = int(os.environ.get("TRACK_BUFFER", "5"))
+TRACKER_CONFIG = os.environ.get("TRACKER_CONFIG", "bytetrack.yaml")
+
+class Detections:
+    """Numpy boxes in the shape ultralytics' trackers read from `Boxes.cpu().numpy()`."""
+
+    def __init__(self, xywh, conf, cls):
+        self.xywh = xywh
+        self.conf = conf
+        self.cls = cls
+
+    @classmethod
+    def from_objects(cls, detected_objects):
+        if not detected_objects:
+            empty = np.zeros((0,), dtype=np.float32)
+            return cls(np.zeros((0, 4), dtype=np.float32), empty, empty)
+        xyxy = np.array([obj["box"] for obj in detected_objects], dtype=np.float32)
+        xywh = np.concatenate([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+        conf = np.array([obj["confidence"] for obj in detected_objects], dtype=np.float32)
+        # Index into detected_objects; the tracker reports it back per track
+        labels = np.arange(len(detected_objects), dtype=np.float32)
+        return cls(xywh, conf, labels)
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __getitem__(self, index):
+        return Detections(self.xywh[index], self.conf[index], self.cls[index])
+
+def tracker_args():
+    import yaml
+    from ultralytics.utils import IterableSimpleNamespace
+    from ultralytics.utils.checks import check_yaml
+
+    with open(check_yaml(TRACKER_CONFIG)) as f:
+        config = yaml.safe_load(f)
+    config["track_buffer"] = TRACK_BUFFER
+    return IterableSimpleNamespace(**config)
+
+class SessionTracker:
+    """ByteTrack state for one session, fed by detections every few frames.
+
+    On frames without detection the tracks are moved forward by the
+    tracker's Kalman filter. Track ids are stable across frames, and each
+    call reports which ids are new and which have been lost for good.
+    """
+
+    def __init__(self, detect_interval=TRACK_DETECT_INTERVAL, min_match_ratio=TRACK_MIN_MATCH_RATIO):
+        from ultralytics.trackers.byte_tracker import BYTETracker
+
+        self.tracker = BYTETracker(tracker_args())
+        self.detect_interval = max(1, detect_interval)
+        self.min_match_ratio = min_match_ratio
+        self.frames_since_detection = None
+        self.match_ratio = 1.0
+        self.labels = {}
+        self.known_ids = set()
+
+    def needs_detection(self):
+        if self.frames_since_detection is None:
+            return True
+        if self.match_ratio < self.min_match_ratio:
+            return True
+        return self.frames_since_detection + 1 >= self.detect_interval
+
+    def _active_tracks(self):
+        return [track for track in self.tracker.tracked_stracks if track.is_activated]
+
+    def update(self, detected_objects):
+        """Feed a full detection; returns (tracked objects, events)."""
+        before = {track.track_id for track in self._active_tracks()}
+        rows = self.tracker.update(Detections.from_objects(detected_objects))
+        for row in rows:
+            track_id, index = int(row[4]), int(row[-1])
+            self.labels[track_id] = detected_objects[index]["class"]
+
+        after = {track.track_id for track in self._active_tracks()}
+        self.match_ratio = len(before & after) / len(before) if before else 1.0
+        self.frames_since_detection = 0
+        return self._objects(), self._events()
+
+    def predict(self):
+        """Move the tracks forward one frame without a detection."""
+        from ultralytics.trackers.byte_tracker import STrack
+
+        STrack.multi_predict(self._active_tracks())
+        self.frames_since_detection += 1
+        return self._objects(), self._events()
+
+    def _objects(self):
+        return [
+            {
+                "class": self.labels.get(track.track_id, "object"),
+                "confidence": float(track.score),
+                "box": track.xyxy.tolist(),
+                "track_id": int(track.track_id),
+            }
+            for track in self._active_tracks()
+        ]
+
+    def _events(self):
+        """'new' the first time a track is confirmed, 'gone' once the tracker drops it."""
+        active = {track.track_id: track for track in self._active_tracks()}
+        alive = set(active) | {track.track_id for track in self.tracker.lost_stracks}
+        events = [
+            {"event": "new", "track_id": int(track_id), "class": self.labels.get(track_id, "object")}
+            for track_id in active if track_id not in self.known_ids
+        ]
+        for track_id in self.known_ids - alive:
+            events.append({"event": "gone", "track_id": int(track_id), "class": self.labels.pop(track_id, "object")})
+        self.known_ids = (self.known_ids & alive) | set(active)
+        return events
@@ -1,17 +1,331 @@
 from deep_translator import GoogleTranslator
-from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock, local
+import os
+import sqlite3
+import time
+
+# Shared by every worker process; set to an empty string to keep translations in memory only
+TRANSLATION_CACHE_PATH = os.environ.get("TRANSLATION_CACHE_PATH", "translation_cache.sqlite3")
+# "google" in production, "identity" to run offline (texts come back unchanged)
+TRANSLATION_UPSTREAM = os.environ.get("TRANSLATION_UPSTREAM", "google")
+
+class GoogleUpstream:
+    """Google Translate through deep_translator, many texts per request."""
+
+    # deep_translator rejects requests over 5000 characters
+    max_chars = 4500
+
+    def __init__(self):
+        # GoogleTranslator keeps each request's text on the instance, so threads can't share one
+        self._local = local()
+
+    def _translator(self, target_lang):
+        translators = getattr(self._local, "translators", None)
+        if translators is None:
+            translators = self._local.translators = {}
+        translator = translators.get(target_lang)
+        if translator is None:
+            translator = GoogleTranslator(source='en', target=target_lang)
+            translators[target_lang] = translator
+        return translator
+
+    def _chunks(self, texts):
+        chunk, size = [], 0
+        for text in texts:
+            # Multi-line texts can't share a newline-joined request
+            if chunk and ("\n" in text or size + len(text) + 1 > self.max_chars):
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(text)
+            size += len(text) + 1
+            if "\n" in text:
+                yield chunk
+                chunk, size = [], 0
+        if chunk:
+            yield chunk
+
+    def translate_batch(self, texts, target_lang):
+        translator = self._translator(target_lang)
+        results = []
+        for chunk in self._chunks(texts):
+            if len(chunk) == 1:
+                lines = [translator.translate(chunk[0])]
+            else:
+                joined = translator.translate("\n".join(chunk))
+                lines = joined.split("\n") if joined else []
+                if len(lines) != len(chunk):
+                    # The translator merged or split lines; go one text at a time
+                    lines = [translator.translate(text) for text in chunk]
+            # A blank line is a failed translation, not the English text: None keeps it out of the cache
+            results.extend((line or "").strip() or None for line in lines)
+        print(f"✅ Translated {len(texts)} texts (en -> {target_lang})")
+        return results
+
+class IdentityUpstream:
+    """Returns texts unchanged; for offline runs, tests and benchmarks."""
+
+    def translate_batch(self, texts, target_lang):
+        return list(texts)
+
+UPSTREAMS = {
+    "google": GoogleUpstream,
+    "identity": IdentityUpstream,
+}
+
+class TranslationCache:
+    """On-disk (text, target_lang) -> translation table shared across processes."""
+
+    # SQLite's default limit on host parameters is 999
+    query_chunk = 500
+
+    def __init__(self, path):
+        self.path = path
+        self._local = local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "text TEXT NOT NULL, target_lang TEXT NOT NULL, translated TEXT NOT NULL, "
+                "PRIMARY KEY (text, target_lang))"
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            # WAL lets several workers read while one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, texts, target_lang):
+        found = {}
+        conn = self._connection()
+        for start in range(0, len(texts), self.query_chunk):
+            chunk = texts[start:start + self.query_chunk]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT text, translated FROM translations WHERE target_lang = ? AND text IN ({placeholders})",
+                [target_lang, *chunk]
+            )
+            found.update(rows)
+        return found
+
+    def put_many(self, pairs, target_lang):
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO translations (text, target_lang, translated) VALUES (?, ?, ?)",
+                [(text, target_lang, translated) for text, translated in pairs]
+            )
+
+class TranslationService:
+    """Cached, single-flight, batched translation.
+
+    Lookups go memory -> SQLite -> upstream. Texts already being fetched by
+    another thread are waited on instead of requested again, and all
+    remaining misses go upstream as one batch. Failed translations, and
+    texts the upstream returns None for, are not cached; by default callers
+    get the original text back.
+    """
+
+    def __init__(self, upstream, cache_path=TRANSLATION_CACHE_PATH, memory_size=5000):
+        self.upstream = upstream
+        self.cache = None
+        if cache_path:
+            try:
+                self.cache = TranslationCache(cache_path)
+            except sqlite3.Error as e:
+                print(f"⚠️ Translation cache disabled ({cache_path}): {str(e)}")
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, pairs, target_lang):
+        with self._lock:
+            for text, translated in pairs:
+                self._memory[(text, target_lang)] = translated
+                self._memory.move_to_end((text, target_lang))
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, texts, target_lang):
+        found = {}
+        with self._lock:
+            for text in texts:
+                translated = self._memory.get((text, target_lang))
+                if translated is not None:
+                    self._memory.move_to_end((text, target_lang))
+                    found[text] = translated
+
+        missing = [text for text in texts if text not in found]
+        if missing and self.cache is not None:
+            try:
+                stored = self.cache.get_many(missing, target_lang)
+            except sqlite3.Error as e:
+                print(f"⚠️ Translation cache read error: {str(e)}")
+                stored = {}
+            self._remember(stored.items(), target_lang)
+            found.update(stored)
+        return found
+
+    def _fetch(self, texts, target_lang):
+        try:
+            translated = self.upstream.translate_batch(texts, target_lang)
+            if len(translated) != len(texts):
+                raise RuntimeError(f"expected {len(texts)} translations, got {len(translated)}")
+        except Exception as e:
+            print(f"⚠️ Translation error: {str(e)}")
+            with self._lock:
+                for text in texts:
+                    self._inflight.pop((text, target_lang)).set_exception(e)
+            return
+
+        # Texts the upstream returned nothing for are retried on a later call
+        pairs = [(text, result) for text, result in zip(texts, translated) if result is not None]
+        self._remember(pairs, target_lang)
+        if self.cache is not None and pairs:
+            try:
+                self.cache.put_many(pairs, target_lang)
+            except sqlite3.Error as e:
+                print(f"⚠️ Translation cache write error: {str(e)}")
+        with self._lock:
+            for text, result in zip(texts, translated):
+                future = self._inflight.pop((text, target_lang))
+                if result is None:
+                    future.set_exception(RuntimeError(f"no translation for {text!r}"))
+                else:
+                    future.set_result(result)
+
+    def translate_many(self, texts, target_lang="en", fallback=True):
+        """Translate a list of English texts, preserving order and duplicates.
+
+        With fallback=False an upstream failure is raised instead of
+        returning the untranslated text.
+        """
+        texts = list(texts)
+        if target_lang == "en":
+            return texts
+
+        unique = [text for text in dict.fromkeys(texts) if text]
+        results = self._lookup(unique, target_lang)
+        self.hits += len(results)
+        missing = [text for text in unique if text not in results]
+        self.misses += len(missing)
+
+        owned, waiting = [], {}
+        with self._lock:
+            for text in missing:
+                future = self._inflight.get((text, target_lang))
+                if future is None:
+                    future = Future()
+                    self._inflight[(text, target_lang)] = future
+                    owned.append(text)
+                waiting[text] = future
+
+        if owned:
+            self._fetch(owned, target_lang)
+
+        for text, future in waiting.items():
+            try:
+                results[text] = future.result()
+            except Exception:
+                if not fallback:
+                    raise
+                results[text] = text
+
+        return [results.get(text, text) for text in texts]
+
+    def translate(self, text, target_lang="en", fallback=True):
+        return self.translate_many([text], target_lang, fallback)[0]
+
+translation_service = TranslationService(UPSTREAMS[TRANSLATION_UPSTREAM]())
 
-@lru_cache(maxsize=1000)
 def translate_text(text: str, target_lang: str = "en") -> str:
     """Translates text to target language with caching."""
     if not text or target_lang == "en":
         return text
+    return translation_service.translate(text, target_lang)
+
+# How long to speak English before retrying a language whose translation failed
+PHRASE_RETRY_SECONDS = 30
+
+# Fixed words of the spoken sentence; everything else is a detection label or a number
+SENTENCE_PHRASES = ("No objects detected", "Distance", "cm")
 
-    try:
-        translator = GoogleTranslator(source='en', target=target_lang)
-        result = translator.translate(text)
-        print(f"✅ Translated: {text} => {result} (en -> {target_lang})")
-        return result if result else text
-    except Exception as e:
-        print(f"⚠️ Translation error: {str(e)}")
-        return text
\ No newline at end of file
+class PhraseEngine:
+    """Builds localized detection sentences without translating per frame.
+
+    Every detection label and the few fixed sentence words are translated
+    once per target language through the translation service, then sentences
+    are assembled locally with the numbers formatted here, so nothing on the
+    per-frame path hits the network.
+    """
+
+    def __init__(self, labels):
+        self.labels = list(dict.fromkeys(labels))
+        english = list(SENTENCE_PHRASES) + self.labels
+        self._english = dict(zip(english, english))
+        self._tables = {"en": self._english}
+        self._retry_at = {}
+        # One lock per language: a slow or failing language doesn't hold up the others
+        self._language_locks = {}
+        self._lock = Lock()
+
+    def is_ready(self, target_lang: str) -> bool:
+        """True if phrases() will return without a network call."""
+        return (
+            target_lang in self._tables
+            or time.monotonic() < self._retry_at.get(target_lang, 0)
+        )
+
+    def phrases(self, target_lang: str) -> dict:
+        """Phrase table for a language, translating it on first use (blocking)."""
+        table = self._tables.get(target_lang)
+        if table is not None:
+            return table
+
+        with self._lock:
+            language_lock = self._language_locks.setdefault(target_lang, Lock())
+        # Single flight: concurrent first uses of a language wait for one translation
+        with language_lock:
+            table = self._tables.get(target_lang)
+            if table is not None:
+                return table
+            if time.monotonic() < self._retry_at.get(target_lang, 0):
+                return self._english
+
+            english = list(self._english)
+            print(f"🔄 Translating {len(english)} phrases to {target_lang}")
+            try:
+                translated = translation_service.translate_many(english, target_lang, fallback=False)
+            except Exception:
+                self._retry_at[target_lang] = time.monotonic() + PHRASE_RETRY_SECONDS
+                return self._english
+
+            table = dict(zip(english, translated))
+            self._tables[target_lang] = table
+        return table
+
+    def warm(self, languages):
+        for target_lang in languages:
+            self.phrases(target_lang)
+
+    def sentence(self, labels, distance, target_lang: str) -> str:
+        """e.g. "person, chair | Distance: 123.4cm" in the target language.
+
+        Never blocks: a language whose table isn't translated yet (see
+        phrases()) is spoken in English.
+        """
+        table = self._tables.get(target_lang, self._english)
+        if labels:
+            text = ", ".join(table.get(label, label) for label in dict.fromkeys(labels))
+        else:
+            text = table["No objects detected"]
+        if distance:
+            text += f" | {table['Distance']}: {distance:.1f}{table['cm']}"
+        return text
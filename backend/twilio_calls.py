@@ -1,13 +1,17 @@
 # twilio_calls.py
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from twilio.rest import Client
+from typing import List, Literal, Optional
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# After load_dotenv, so .env settings reach the module's constants
+from alerts import AlertDispatcher, AlertQueue, create_transport
+
 router = APIRouter()
 
 # Twilio credentials from environment variables
@@ -15,14 +19,21 @@ ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_NUMBER = os.getenv("TWILIO_NUMBER")
 
-client = Client(ACCOUNT_SID, AUTH_TOKEN)
+_client = None
+
+def get_client():
+    """Twilio client, created on first use."""
+    global _client
+    if _client is None:
+        _client = Client(ACCOUNT_SID, AUTH_TOKEN)
+    return _client
 
 class CallRequest(BaseModel):
     to: str
 
 @router.post("/make-call")
 def make_call(request: CallRequest):
-    call = client.calls.create(
+    call = get_client().calls.create(
         to=request.to,
         from_=TWILIO_NUMBER,
         twiml='<Response><Say>Hello How Are You</Say></Response>'
@@ -36,7 +47,7 @@ class SMSRequest(BaseModel):
 @router.post("/send-sms")
 def send_sms(request: SMSRequest):
     try:
-        message = client.messages.create(
+        message = get_client().messages.create(
             to=request.to,
             from_=TWILIO_NUMBER,
             body=request.message
@@ -52,11 +63,49 @@ class WhatsAppRequest(BaseModel):
 @router.post("/send-whatsapp")
 def send_whatsapp_message(request: WhatsAppRequest):
     try:
-        message = client.messages.create(
+        message = get_client().messages.create(
             to=f"whatsapp:{request.to}",
             from_="whatsapp:+14155238886",
             body=request.message
         )
         return {"sid": message.sid, "status": message.status}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+dispatcher: Optional[AlertDispatcher] = None
+
+async def start_dispatcher():
+    global dispatcher
+    dispatcher = AlertDispatcher(create_transport(), AlertQueue())
+    # Picks up retries left pending by the last run
+    dispatcher.start()
+
+async def stop_dispatcher():
+    if dispatcher is not None:
+        await dispatcher.stop()
+
+class AlertRequest(BaseModel):
+    message: str
+    contacts: List[str] = Field(min_length=1)
+    channels: List[Literal["call", "sms", "whatsapp"]] = ["sms"]
+
+@router.post("/alerts")
+async def send_alert(request: AlertRequest):
+    """One alert to every contact on every channel, concurrently; failures are retried in the background."""
+    if dispatcher is None:
+        raise HTTPException(status_code=503, detail="Alert dispatcher not running")
+    # Duplicates would page the same person twice
+    contacts = list(dict.fromkeys(request.contacts))
+    channels = list(dict.fromkeys(request.channels))
+    alert_id, deliveries = await dispatcher.submit(request.message, contacts, channels)
+    return {"alert_id": alert_id, "deliveries": deliveries}
+
+@router.get("/alerts/{alert_id}")
+async def alert_status(alert_id: str):
+    """Per-recipient delivery status: sent, pending (retry scheduled), sending or failed."""
+    if dispatcher is None:
+        raise HTTPException(status_code=503, detail="Alert dispatcher not running")
+    deliveries = dispatcher.queue.status(alert_id)
+    if not deliveries:
+        raise HTTPException(status_code=404, detail="Unknown alert")
+    return {"alert_id": alert_id, "deliveries": deliveries}
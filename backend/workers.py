@@ -0,0 +1,325 @@
+import asyncio
+import itertools
+import multiprocessing as mp
+import os
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from frames import FRAME_TARGET_SIZE
+
+# 0 keeps inference in the server process; N > 0 starts N model-owning worker processes
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "0"))
+# Frames each worker can hold at once (queued plus in inference)
+WORKER_SLOTS = int(os.environ.get("WORKER_SLOTS", "8"))
+# Cores kept for the socket-handling front end; the rest are split between workers
+FRONTEND_CORES = int(os.environ.get("FRONTEND_CORES", "1"))
+WORKER_BATCH_SIZE = int(os.environ.get("WORKER_BATCH_SIZE", "4"))
+WORKER_BATCH_WINDOW_MS = float(os.environ.get("WORKER_BATCH_WINDOW_MS", "10"))
+
+def _align(size, alignment=64):
+    return (size + alignment - 1) // alignment * alignment
+
+class SlotRing:
+    """Fixed slots in one shared memory block, each holding a frame and its depth map.
+
+    Both processes map the same block, so frames and depth maps cross the
+    process boundary without being pickled; only slot numbers and shapes
+    travel over the pipes.
+    """
+
+    def __init__(self, buf, slots, frame_capacity, depth_capacity):
+        self.buf = buf
+        self.slots = slots
+        self.frame_capacity = _align(frame_capacity)
+        self.depth_capacity = _align(depth_capacity)
+        self.slot_size = self.frame_capacity + self.depth_capacity
+
+    @classmethod
+    def size(cls, slots, frame_capacity, depth_capacity):
+        return slots * (_align(frame_capacity) + _align(depth_capacity))
+
+    def frame(self, slot, shape):
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.buf, offset=slot * self.slot_size)
+
+    def depth(self, slot, shape):
+        offset = slot * self.slot_size + self.frame_capacity
+        return np.ndarray(shape, dtype=np.float32, buffer=self.buf, offset=offset)
+
+    def write_frame(self, slot, frame):
+        """Copy a frame into a slot, downscaling it if it doesn't fit; returns its shape."""
+        h, w = frame.shape[:2]
+        if frame.nbytes > self.frame_capacity:
+            scale = (self.frame_capacity / frame.nbytes) ** 0.5
+            h, w = max(1, int(h * scale)), max(1, int(w * scale))
+            target = self.frame(slot, (h, w, 3))
+            cv2.resize(frame, (w, h), dst=target, interpolation=cv2.INTER_AREA)
+        else:
+            np.copyto(self.frame(slot, frame.shape), frame)
+        return (h, w, 3)
+
+    def close(self):
+        # Views into the block must be gone before SharedMemory.close()
+        self.buf = None
+
+def worker_main(worker_id, model_path, shm_name, slots, frame_capacity, depth_capacity,
+                requests, results, cores, batch_size, window_ms):
+    """Entry point of an inference worker process."""
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    thread_count = max(1, len(cores)) if cores else None
+
+    import torch
+    if thread_count:
+        torch.set_num_threads(thread_count)
+    cv2.setNumThreads(1)
+
+    from backends import load_yolo
+    from control import QUALITY_LEVELS
+    from depth import detected_objects_from_results
+    from models import registry
+
+    model = load_yolo(model_path)
+    depth_engine = registry.get("depth")
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = SlotRing(shm.buf, slots, frame_capacity, depth_capacity)
+    results.send(("ready", dict(model.names)))
+    print(f"✅ Inference worker {worker_id} ready (pid {os.getpid()}, cores {sorted(cores) if cores else 'all'})")
+
+    running = True
+    while running:
+        try:
+            request = requests.recv()
+        except EOFError:
+            # Front end went away
+            break
+        if request is None:
+            break
+        batch = [request]
+        deadline = time.monotonic() + window_ms / 1000.0
+        while len(batch) < batch_size and requests.poll(max(0.0, deadline - time.monotonic())):
+            request = requests.recv()
+            if request is None:
+                running = False
+                break
+            batch.append(request)
+
+        frames = [ring.frame(slot, shape) for _, slot, shape, _, _ in batch]
+        # One resolution per batch: the most degraded level any request asked for
+        level = QUALITY_LEVELS[max(request[3] for request in batch)]
+        detections = None
+        # Every request gets exactly one answer: the front end frees its slot on each one
+        answers = []
+        try:
+            # Tracking sessions skip YOLO on most frames; depth runs for every frame
+            detect_frames = [frame for frame, request in zip(frames, batch) if request[4]]
+            detections = iter(model(detect_frames, imgsz=level.yolo_imgsz, verbose=False) if detect_frames else [])
+            depth_maps = depth_engine.infer(frames, level.depth_input_size)
+            for (request_id, slot, _, _, detect), depth_map in zip(batch, depth_maps):
+                np.copyto(ring.depth(slot, depth_map.shape), depth_map)
+                objects = detected_objects_from_results(next(detections)) if detect else None
+                answers.append(("result", request_id, slot, objects, depth_map.shape, None))
+            if len(answers) < len(batch):
+                raise RuntimeError(f"expected {len(batch)} depth maps, got {len(answers)}")
+        except Exception as e:
+            print(f"❌ Inference worker {worker_id} error: {str(e)}")
+            for request_id, slot, *_ in batch[len(answers):]:
+                answers.append(("result", request_id, slot, None, None, str(e)))
+        for answer in answers:
+            results.send(answer)
+        # Results keep views of the slots; drop them before the block is closed
+        frames = detections = None
+
+    ring.close()
+    shm.close()
+
+class WorkerHandle:
+    """Front-end side of one worker process."""
+
+    def __init__(self, worker_id, process, requests, results, shm, ring):
+        self.worker_id = worker_id
+        self.process = process
+        self.requests = requests
+        self.results = results
+        self.shm = shm
+        self.ring = ring
+        self.free_slots = list(range(ring.slots))
+        self.pending = {}
+        self.ready = False
+        self.alive = True
+
+class WorkerPool:
+    """Hands decoded frames to model-owning worker processes through shared memory.
+
+    The front end writes each frame into a free slot of the least busy
+    worker and sends (request id, slot, shape, level, detect) down a pipe.
+    The worker runs YOLO and depth on a micro-batch and answers with the
+    detected objects; the depth map comes back through the same slot.
+    """
+
+    def __init__(self, count, model_path, depth_input_size, slots=WORKER_SLOTS,
+                 batch_size=WORKER_BATCH_SIZE, window_ms=WORKER_BATCH_WINDOW_MS):
+        self.count = count
+        self.model_path = model_path
+        self.slots = slots
+        self.batch_size = batch_size
+        self.window_ms = window_ms
+        self.frame_capacity = FRAME_TARGET_SIZE * FRAME_TARGET_SIZE * 3
+        width, height = depth_input_size
+        self.depth_capacity = width * height * 4
+        self.workers = []
+        self.names = None
+        self._ids = itertools.count()
+        self._slot_freed = None
+        self._ready = None
+
+    def _core_sets(self):
+        if not hasattr(os, "sched_getaffinity"):
+            return [None] * self.count
+        cores = sorted(os.sched_getaffinity(0))
+        worker_cores = cores[FRONTEND_CORES:] if len(cores) > FRONTEND_CORES else cores
+        per_worker = max(1, len(worker_cores) // self.count)
+        return [
+            set(worker_cores[(i * per_worker) % len(worker_cores):][:per_worker])
+            for i in range(self.count)
+        ]
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._slot_freed = asyncio.Condition()
+        self._ready = asyncio.Event()
+        # spawn: children import only what they need instead of inheriting torch state
+        ctx = mp.get_context("spawn")
+        size = SlotRing.size(self.slots, self.frame_capacity, self.depth_capacity)
+
+        for worker_id, cores in enumerate(self._core_sets()):
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            ring = SlotRing(shm.buf, self.slots, self.frame_capacity, self.depth_capacity)
+            requests_recv, requests_send = ctx.Pipe(duplex=False)
+            results_recv, results_send = ctx.Pipe(duplex=False)
+            process = ctx.Process(
+                target=worker_main,
+                args=(worker_id, self.model_path, shm.name, self.slots, self.frame_capacity,
+                      self.depth_capacity, requests_recv, results_send, cores,
+                      self.batch_size, self.window_ms),
+                name=f"inference-{worker_id}",
+                daemon=True
+            )
+            process.start()
+            requests_recv.close()
+            results_send.close()
+
+            worker = WorkerHandle(worker_id, process, requests_send, results_recv, shm, ring)
+            self.workers.append(worker)
+            loop.add_reader(results_recv.fileno(), self._on_results, worker)
+        print(f"🔄 Started {self.count} inference workers")
+
+    async def wait_ready(self):
+        """Until a worker is ready; raises once every worker has died instead."""
+        await self._ready.wait()
+        if not any(w.alive for w in self.workers):
+            raise RuntimeError("no inference workers alive")
+
+    def _on_results(self, worker):
+        try:
+            while worker.results.poll():
+                message = worker.results.recv()
+                if message[0] == "ready":
+                    worker.ready = True
+                    self.names = message[1]
+                    self._ready.set()
+                    continue
+                _, request_id, slot, objects, depth_shape, error = message
+                self._complete(worker, request_id, slot, objects, depth_shape, error)
+        except (EOFError, OSError):
+            self._worker_died(worker)
+
+    def _complete(self, worker, request_id, slot, objects, depth_shape, error):
+        future = worker.pending.pop(request_id, None)
+        depth_map = None
+        if error is None:
+            # Copy out before the slot is handed to the next frame
+            depth_map = worker.ring.depth(slot, depth_shape).copy()
+        worker.free_slots.append(slot)
+        asyncio.ensure_future(self._notify_slot_freed())
+
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result((objects, depth_map))
+
+    async def _notify_slot_freed(self):
+        async with self._slot_freed:
+            self._slot_freed.notify_all()
+
+    def _worker_died(self, worker):
+        if not worker.alive:
+            return
+        worker.alive = False
+        asyncio.get_running_loop().remove_reader(worker.results.fileno())
+        print(f"❌ Inference worker {worker.worker_id} exited (code {worker.process.exitcode})")
+        for future in worker.pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError(f"inference worker {worker.worker_id} died"))
+        worker.pending.clear()
+        if not any(w.alive for w in self.workers):
+            # Wakes anything waiting for a ready worker or a free slot, so it can fail
+            self._ready.set()
+        asyncio.ensure_future(self._notify_slot_freed())
+
+    def status(self):
+        return {
+            worker.worker_id: "dead" if not worker.alive else "ready" if worker.ready else "loading"
+            for worker in self.workers
+        }
+
+    def _pick_worker(self):
+        candidates = [w for w in self.workers if w.alive and w.ready and w.free_slots]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda w: len(w.pending))
+
+    async def submit(self, frame, level=0, detect=True):
+        """Run detection and depth for one frame; returns (detected_objects, depth_map).
+
+        `level` indexes control.QUALITY_LEVELS and sets the model resolution.
+        With `detect=False` only depth runs and detected_objects is None.
+        """
+        await self.wait_ready()
+        async with self._slot_freed:
+            worker = self._pick_worker()
+            while worker is None:
+                if not any(w.alive for w in self.workers):
+                    raise RuntimeError("no inference workers alive")
+                await self._slot_freed.wait()
+                worker = self._pick_worker()
+            slot = worker.free_slots.pop()
+
+        shape = worker.ring.write_frame(slot, frame)
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        worker.pending[request_id] = future
+        worker.requests.send((request_id, slot, shape, level, detect))
+        return await future
+
+    def stop(self):
+        loop = asyncio.get_running_loop()
+        for worker in self.workers:
+            if worker.alive:
+                loop.remove_reader(worker.results.fileno())
+                try:
+                    worker.requests.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+        for worker in self.workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.ring.close()
+            worker.shm.close()
+            worker.shm.unlink()
+        self.workers = []
@@ -8,9 +8,25 @@ import { useCamera } from '../../permissions/useCamera';
 import { Ionicons } from '@expo/vector-icons';
 import { SERVER_IP } from "../../lib/constants";
 import { Camera } from 'expo-camera';
+import * as ImageManipulator from 'expo-image-manipulator';
 
 import { styles } from "./CameraStyles";
 
+// Capture settings the server recommends in each response's `control` field
+type CaptureControl = {
+  level: number;
+  interval_ms: number;
+  jpeg_quality: number;
+  max_width: number;
+};
+
+const DEFAULT_CONTROL: CaptureControl = {
+  level: 0,
+  interval_ms: 200,
+  jpeg_quality: 0.5,
+  max_width: 640,
+};
+
 export default function CameraScreen() {  
   const { targetLanguage, translateText } = useTranslation();
   const { hasPermission, requestPermission } = useCamera();
@@ -29,6 +45,14 @@ export default function CameraScreen() {
   const appState = useRef(AppState.currentState);
   const [isActive, setIsActive] = useState(true);
   const [isTorchOn, setIsTorchOn] = useState(false);
+  const controlRef = useRef<CaptureControl>(DEFAULT_CONTROL);
+  // Session token from the server; reconnecting with it keeps the server-side session
+  const sessionRef = useRef<string | null>(null);
+  const languageRef = useRef(targetLanguage);
+  // Wait before reconnecting; longer when the server turned us away for being at capacity
+  const reconnectDelayRef = useRef<number>(2000);
+  // Shortest capture interval the server accepts; faster frames are dropped unread
+  const minIntervalRef = useRef<number>(0);
 
   function toggleCamera() {
     setFacing(current => current === "back" ? "front" : "back");
@@ -86,7 +110,8 @@ export default function CameraScreen() {
     console.log(`🔄 Connecting WebSocket with language: ${targetLanguage}`);
     setIsConnected(false);
     
-    const ws = new WebSocket(`ws://${SERVER_IP}:8000/ws/video?target=${targetLanguage}`);
+    const session = sessionRef.current ? `&session=${sessionRef.current}` : '';
+    const ws = new WebSocket(`ws://${SERVER_IP}:8000/ws/video?target=${languageRef.current}&delta=1${session}`);
     ws.onopen = () => {
       if (currentAttempt !== connectionAttemptRef.current) {
         console.log("⚠️ Outdated connection attempt, closing");
@@ -94,10 +119,16 @@ export default function CameraScreen() {
         return;
       }
       
-      console.log(`✅ Connected to WebSocket (${targetLanguage})`);
+      console.log(`✅ Connected to WebSocket (${languageRef.current})`);
       wsRef.current = ws;
-      isStreaming.current = true;
+      controlRef.current = DEFAULT_CONTROL;
       setIsConnected(true);
+      if (appState.current.match(/inactive|background/)) {
+        // Reconnected while in the background: hold the session without streaming
+        ws.send(JSON.stringify({ type: 'pause' }));
+        return;
+      }
+      isStreaming.current = true;
       startStreaming();
     };
 
@@ -109,6 +140,20 @@ export default function CameraScreen() {
     ws.onmessage = (event) => {
       try {
         const result = JSON.parse(event.data);
+        if (result.type === 'session') {
+          if (result.status === 'rejected') {
+            console.log(`⚠️ Server at capacity, retrying in ${result.retry_after}s`);
+            reconnectDelayRef.current = result.retry_after * 1000;
+            return;
+          }
+          sessionRef.current = result.session;
+          reconnectDelayRef.current = 2000;
+          minIntervalRef.current = result.max_fps ? 1000 / result.max_fps : 0;
+          return;
+        }
+        if (result.control) {
+          controlRef.current = { ...DEFAULT_CONTROL, ...result.control };
+        }
         if (result.translated_text) {
           setDetectionResult(result.translated_text);
         }
@@ -137,10 +182,19 @@ export default function CameraScreen() {
       setIsConnected(false);
       
       if (currentAttempt === connectionAttemptRef.current) {
-        reconnectTimeout.current = setTimeout(connectWebSocket, 2000);
+        reconnectTimeout.current = setTimeout(connectWebSocket, reconnectDelayRef.current);
       }
     };
-  }, [targetLanguage, closeWebSocket]);
+  }, [closeWebSocket]);
+
+  // Pause, resume and language changes go over the open socket instead of reconnecting
+  const sendControl = (message: object) => {
+    if (wsRef.current?.readyState === WebSocket.OPEN) {
+      wsRef.current.send(JSON.stringify(message));
+      return true;
+    }
+    return false;
+  };
 
   const startStreaming = async () => {
     while (
@@ -151,26 +205,32 @@ export default function CameraScreen() {
       try {
         if (!cameraRef.current) continue;
 
+        const control = controlRef.current;
         const pictureOptions: CameraPictureOptions = {
-          base64: true,
-          quality: 0.5,
+          quality: control.jpeg_quality,
           shutterSound: false,
         };
 
         const photo = await cameraRef.current.takePictureAsync(pictureOptions);
+        // Downscale on the phone so a loaded server also gets fewer bytes to decode
+        const frame = photo && await ImageManipulator.manipulateAsync(
+          photo.uri,
+          photo.width > control.max_width ? [{ resize: { width: control.max_width } }] : [],
+          { compress: control.jpeg_quality, format: ImageManipulator.SaveFormat.JPEG, base64: true }
+        );
 
         if (
           isActive && 
           isStreaming.current && 
           wsRef.current?.readyState === WebSocket.OPEN && 
-          photo?.base64
+          frame?.base64
         ) {
-          wsRef.current.send(photo.base64);
+          wsRef.current.send(frame.base64);
         }
       } catch (err) {
         console.error("🚫 Frame capture error:", err);
       }
-      await new Promise(resolve => setTimeout(resolve, 200));
+      await new Promise(resolve => setTimeout(resolve, Math.max(controlRef.current.interval_ms, minIntervalRef.current)));
     }
   };
 
@@ -189,28 +249,40 @@ export default function CameraScreen() {
     ) {
       // App came to foreground
       setIsActive(true);
-      connectWebSocket();
     } else if (
       appState.current === 'active' && 
       nextAppState.match(/inactive|background/)
     ) {
       // App went to background
       setIsActive(false);
-      closeWebSocket();
     }
 
     appState.current = nextAppState;
   };
 
   useEffect(() => {
-    if (isActive) {
+    languageRef.current = targetLanguage;
+    if (sendControl({ type: 'language', target: targetLanguage })) {
       console.log(`📢 Language changed to: ${targetLanguage}`);
-      connectWebSocket();
-      return closeWebSocket;
+    }
+  }, [targetLanguage]);
+
+  useEffect(() => {
+    if (isActive) {
+      if (sendControl({ type: 'resume' })) {
+        isStreaming.current = true;
+        startStreaming();
+      } else {
+        connectWebSocket();
+      }
     } else {
-      closeWebSocket();
+      // The socket stays open; a paused session costs the server next to nothing
+      isStreaming.current = false;
+      sendControl({ type: 'pause' });
     }
-  }, [targetLanguage, isActive, connectWebSocket, closeWebSocket]);
+  }, [isActive, connectWebSocket]);
+
+  useEffect(() => closeWebSocket, [closeWebSocket]);
 
   const handleCameraPress = () => {
     if (detectionResult) {
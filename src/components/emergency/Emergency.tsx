@@ -111,6 +111,20 @@ const EmergencyScreen: React.FC = () => {
     }
   };
 
+  // Every contact at once, by SMS and WhatsApp; the server retries failed deliveries
+  const sendEmergencyAlert = async (message: string) => {
+    try {
+      const response = await axios.post(`http://${SERVER_IP}:8000/alerts`, {
+        message,
+        contacts,
+        channels: ['sms', 'whatsapp']
+      });
+      console.log(`🚨 Alert ${response.data.alert_id} sent to ${contacts.length} contacts`);
+    } catch (error) {
+      console.error('Alert failed:', error);
+    }
+  };
+
   const handleFallDetected = async () => {
     // Stop any existing timeout
     if (alertTimeoutRef.current) {
@@ -143,6 +157,7 @@ const EmergencyScreen: React.FC = () => {
             }
             if (contacts.length > 0) {
               await speakText(await translateText('Calling emergency contact now'));
+              sendEmergencyAlert('Fall detected. I need help.');
               makeEmergencyCall(contacts[0]);
             }
           },
@@ -157,6 +172,7 @@ const EmergencyScreen: React.FC = () => {
       if (contacts.length > 0) {
         const noResponseMessage = await translateText('No response detected. Calling emergency contact.');
         await speakText(noResponseMessage);
+        sendEmergencyAlert('Fall detected and no response for 20 seconds. Please check on me.');
         makeEmergencyCall(contacts[0]);
       }
     }, 20000); // 20 seconds
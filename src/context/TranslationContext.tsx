@@ -19,6 +19,7 @@ interface TranslationContextType {
   setTargetLanguage: (lang: string) => Promise<void>;
   supportedLanguages: Language[];
   translateText: (text: string) => Promise<string>;
+  translateTexts: (texts: string[]) => Promise<string[]>;
 }
 
 const TranslationContext = createContext<TranslationContextType | undefined>(undefined);
@@ -81,6 +82,33 @@ export function TranslationProvider({ children }: { children: React.ReactNode })
     }
   };
 
+  // Translate every string of a screen in one round trip
+  const translateTexts = async (texts: string[]): Promise<string[]> => {
+    if (texts.length === 0 || targetLanguage === 'en') {
+      return texts;
+    }
+
+    try {
+      const response = await fetch(`http://${SERVER_IP}:8000/translate/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          texts,
+          target_lang: targetLanguage
+        })
+      });
+
+      if (!response.ok) throw new Error('Batch translation failed');
+
+      const data = await response.json();
+      const translated: string[] = data.translated_texts || [];
+      return texts.map((text, i) => translated[i] || text);
+    } catch (error) {
+      console.error('Batch translation error:', error);
+      return texts;
+    }
+  };
+
   const handleSetTargetLanguage = async (lang: string): Promise<void> => {
     // Prevent concurrent language changes
     if (isChanging) return;
@@ -109,7 +137,8 @@ export function TranslationProvider({ children }: { children: React.ReactNode })
       targetLanguage,
       setTargetLanguage: handleSetTargetLanguage,
       supportedLanguages: SUPPORTED_LANGUAGES,
-      translateText
+      translateText,
+      translateTexts
     }}>
       {children}
     </TranslationContext.Provider>